@@ -1,10 +1,49 @@
+import hashlib
+import json
 import logging
-from typing import List, Dict
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from openai import OpenAI
 from config import Config
+from metrics import metrics
+from news_item import NewsItem
+from ranker import NewsRanker
+from resilience import ResilientClient
+from storage import SqliteCache, atomic_write
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = ("你是一位专业的新闻编辑。你的任务是从提供的新闻数据中提取有价值的内容并生成简报。\n\n"
+                 "严格要求:\n"
+                 "1. 直接输出最终简报,不要输出任何思考过程\n"
+                 "2. 只使用 content 字段中的内容,忽略无效数据\n"
+                 "3. 如果某条新闻的 content 为空或只是网站首页描述,直接跳过\n"
+                 "4. 每个分类至少需要 2 条有效新闻才输出该分类\n"
+                 "5. 每条新闻必须包含: 标题(加粗)、2-3句核心摘要、原文链接\n"
+                 "6. 使用 Markdown 格式,语言为中文\n"
+                 "7. 示例输出格式:\n"
+                 "**标题**: 这是新闻标题\n"
+                 "**摘要**: 这是新闻摘要\n"
+                 "**链接**: http://example.com/news-article\n")
+
+CATEGORY_SYSTEM_PROMPT = ("你是一位专业的新闻编辑。你的任务是从提供的单个分类新闻数据中提取有价值的内容。\n\n"
+                          "严格要求:\n"
+                          "1. 直接输出该分类的新闻条目,不要输出分类标题和任何思考过程\n"
+                          "2. 只使用 content 字段中的内容,忽略无效数据\n"
+                          "3. 如果某条新闻的 content 为空或只是网站首页描述,直接跳过\n"
+                          "4. 每条新闻必须包含: 标题(加粗)、2-3句核心摘要、原文链接\n"
+                          "5. 使用 Markdown 格式,语言为中文\n"
+                          "6. 示例输出格式:\n"
+                          "**标题**: 这是新闻标题\n"
+                          "**摘要**: 这是新闻摘要\n"
+                          "**链接**: http://example.com/news-article\n")
+
+CATEGORY_PROMPT_HEADER = "请从以下单个分类的新闻数据中挑选有价值的新闻并生成摘要。\n\n---\n\n"
+
 
 class AIProcessor:
     """AI 新闻处理器"""
@@ -13,115 +52,570 @@ class AIProcessor:
         if not Config.OPENAI.api_key:
             raise ValueError("OpenAI API Key 未配置")
 
+        # 重试由 ResilientClient 统一处理, 关闭 SDK 自带的重试
         self.client = OpenAI(api_key=Config.OPENAI.api_key,
-                             base_url=Config.OPENAI.base_url)
+                             base_url=Config.OPENAI.base_url,
+                             max_retries=0)
+        self.resilience = ResilientClient('openai',
+                                          Config.RESILIENCE.openai_rate,
+                                          burst=Config.OPENAI.map_concurrency)
+
+        self.cache = None
+        if Config.OPENAI.cache_path:
+            self.cache = CompletionCache(Config.OPENAI.cache_path,
+                                         Config.OPENAI.cache_ttl,
+                                         Config.OPENAI.cache_max_entries)
+        self.last_brief = LastGoodBrief(Config.OPENAI.last_brief_path)
+        self.ranker = NewsRanker()
+
+        # 各分类最近一次实际写入 Prompt 的新闻, 生成失败的分类为空
+        self._packed: Dict[str, List[NewsItem]] = {}
+
+        # 按分类生成时各分类共享的 Prompt 总预算 (OPENAI_PROMPT_TOKEN_BUDGET)
+        self._budget_lock = threading.Lock()
+        self._prompt_remaining = Config.OPENAI.prompt_token_budget
         logger.info("OpenAI 客户端初始化成功")
 
-    def analyze_and_summarize(self, news_items: List[Dict]) -> str:
-        """分析新闻并生成简报"""
+    @metrics.timed('openai.analyze_and_summarize')
+    def analyze_and_summarize(self,
+                              news_items: List[NewsItem]) -> Optional[str]:
+        """分析新闻并生成简报, 生成失败时返回 None"""
 
         if not news_items:
             return "暂无新闻数据"
 
         categories = self._group_by_category(news_items)
+
+        if Config.OPENAI.summary_mode == 'map_reduce':
+            self.reset_prompt_budget()
+            return self._map_reduce(categories)
+
         prompt = self._build_prompt(categories)
 
         try:
             logger.info("开始生成新闻简报")
 
-            response = self.client.chat.completions.create(
+            result = self._complete(SYSTEM_PROMPT, prompt,
+                                    Config.OPENAI.max_tokens)
+            logger.info("新闻简报生成完成")
+
+            self.last_brief.save(result, categories)
+            return result
+
+        except Exception as e:
+            logger.error(f"新闻分析失败: {e}")
+            return None
+
+    def _complete(self, system_prompt: str, user_prompt: str,
+                  max_tokens: int) -> str:
+        """调用 Chat Completion, 相同 Prompt 优先读取缓存"""
+
+        key = None
+        if self.cache:
+            key = CompletionCache.make_key(system_prompt, user_prompt,
+                                           max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.incr('openai.cache_hits')
+                logger.info("命中生成缓存")
+                return cached
+
+        with metrics.timer('openai.completion'):
+            response = self.resilience.call(
+                self.client.chat.completions.create,
                 model=Config.OPENAI.model,
                 messages=[{
-                    "role":
-                    "system",
-                    "content": ("你是一位专业的新闻编辑。你的任务是从提供的新闻数据中提取有价值的内容并生成简报。\n\n"
-                                "严格要求:\n"
-                                "1. 直接输出最终简报,不要输出任何思考过程\n"
-                                "2. 只使用 content 字段中的内容,忽略无效数据\n"
-                                "3. 如果某条新闻的 content 为空或只是网站首页描述,直接跳过\n"
-                                "4. 每个分类至少需要 2 条有效新闻才输出该分类\n"
-                                "5. 每条新闻必须包含: 标题(加粗)、2-3句核心摘要、原文链接\n"
-                                "6. 使用 Markdown 格式,语言为中文\n"
-                                "7. 示例输出格式:\n"
-                                "**标题**: 这是新闻标题\n"
-                                "**摘要**: 这是新闻摘要\n"
-                                "**链接**: http://example.com/news-article\n")
+                    "role": "system",
+                    "content": system_prompt
                 }, {
                     "role": "user",
-                    "content": prompt
+                    "content": user_prompt
                 }],
-                max_tokens=Config.OPENAI.max_tokens,
+                max_tokens=max_tokens,
                 temperature=Config.OPENAI.temperature)
 
-            result = response.choices[0].message.content.strip()
-            logger.info("新闻简报生成完成")
+        metrics.incr('openai.api_calls')
+        metrics.record_usage(getattr(response, 'usage', None))
 
-            return result
+        text = response.choices[0].message.content.strip()
+        if self.cache and text:
+            self.cache.put(key, text)
 
-        except Exception as e:
-            logger.error(f"新闻分析失败: {e}")
-            return f"分析失败: {str(e)}"
+        return text
 
-    def _group_by_category(self,
-                           news_items: List[Dict]) -> Dict[str, List[Dict]]:
-        """按分类分组并过滤无效数据"""
+    def packed_items(self, news_items: List[NewsItem]) -> List[NewsItem]:
+        """news_items 中实际写入 Prompt 并生成了摘要的新闻
 
-        categories = {}
+        被 token 预算、条数上限截掉的新闻, 以及条数不足或生成失败的分类不在其中
+        """
 
-        for item in news_items:
-            content = item.get('content', '').strip()
+        packed = {
+            id(item)
+            for items in list(self._packed.values()) for item in items
+        }
+        return [item for item in news_items if id(item) in packed]
+
+    def reset_prompt_budget(self):
+        """重置各分类共享的 Prompt 总预算, 每次运行开始时调用
+
+        流水线模式下分类陆续到达, 先到的分类先使用预算
+        """
 
-            # 过滤条件
-            if not content or len(content) < 50:
-                logger.debug(f"过滤无效新闻: {item.get('title', '无标题')}")
+        with self._budget_lock:
+            self._prompt_remaining = Config.OPENAI.prompt_token_budget
+
+    def _category_prompts(
+            self, categories: Dict[str, List[NewsItem]]) -> Dict[str, str]:
+        """为每个分类单独构建 Prompt, 单分类不超过分类预算, 全部分类合计不超过总预算"""
+
+        header = estimate_tokens(CATEGORY_PROMPT_HEADER)
+        prompts = {}
+
+        for category, items in categories.items():
+            self._packed[category] = []
+            if len(items) < 2:
                 continue
 
-            # 过滤首页描述特征
-            invalid_keywords = [
-                'welcome to', 'homepage', 'official website', 'latest updates',
-                'follow us', 'subscribe'
-            ]
+            with self._budget_lock:
+                budget = min(Config.OPENAI.category_token_budget,
+                             self._prompt_remaining - header)
+                section, used = self._pack_category(category, items, budget)
+                if section is not None:
+                    self._prompt_remaining -= header + used
 
-            if any(kw in content.lower() for kw in invalid_keywords):
-                logger.debug(f"过滤首页链接: {item.get('url', '')}")
+            if section is None:
+                logger.warning(f"[{category}] token 预算不足, 跳过该分类")
                 continue
 
-            category = item.get('category', '其他')
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(item)
+            prompts[category] = CATEGORY_PROMPT_HEADER + section
+
+        return prompts
+
+    def _map_reduce(self,
+                    categories: Dict[str, List[NewsItem]]) -> Optional[str]:
+        """各分类并发生成摘要, 再拼装为完整简报, 全部失败时返回 None"""
+
+        prompts = self._category_prompts(categories)
+
+        if not prompts:
+            return "暂无新闻数据"
+
+        logger.info(f"并发生成 {len(prompts)} 个分类摘要")
+
+        with ThreadPoolExecutor(max_workers=Config.OPENAI.map_concurrency,
+                                thread_name_prefix='summarize') as executor:
+            futures = {
+                category:
+                executor.submit(self._complete, CATEGORY_SYSTEM_PROMPT,
+                                prompt, Config.OPENAI.map_max_tokens)
+                for category, prompt in prompts.items()
+            }
+
+        sections = {}
+        failed = []
+        for category, future in futures.items():
+            try:
+                sections[category] = future.result()
+                logger.info(f"[{category}] 摘要生成完成")
+            except Exception as e:
+                logger.error(f"[{category}] 摘要生成失败: {e}")
+                self._packed[category] = []
+                failed.append(category)
+
+        if not sections:
+            logger.error(f"所有分类摘要生成失败: {', '.join(failed)}")
+            return None
+
+        brief = self.assemble(sections, failed)
+        self.last_brief.save(brief, categories)
+        return brief
+
+    def summarize_category(self, category: str,
+                           items: List[NewsItem]) -> Optional[str]:
+        """生成单个分类的摘要, 有效新闻不足时返回 None"""
+
+        grouped = self._group_by_category(items)
+        prompt = self._category_prompts(grouped).get(category)
+
+        if prompt is None:
+            return None
+
+        return self._complete(CATEGORY_SYSTEM_PROMPT, prompt,
+                              Config.OPENAI.map_max_tokens)
+
+    def stream_summarize(
+        self, news_items: List[NewsItem]
+    ) -> Iterator[Tuple[str, Optional[str]]]:
+        """流式生成各分类摘要, 按完成顺序逐个产出 (分类, 摘要), 失败时摘要为 None"""
+
+        categories = self._group_by_category(news_items)
+        self.reset_prompt_budget()
+        prompts = self._category_prompts(categories)
+        checkpoint = BriefCheckpoint(Config.OPENAI.checkpoint_path, prompts)
+
+        pending = {}
+        for category, prompt in prompts.items():
+            cached = checkpoint.completed(category)
+            if cached is not None:
+                logger.info(f"[{category}] 从检查点恢复摘要")
+                yield category, cached
+            else:
+                pending[category] = prompt
+
+        if not pending:
+            return
+
+        logger.info(f"流式生成 {len(pending)} 个分类摘要")
+
+        with ThreadPoolExecutor(max_workers=Config.OPENAI.map_concurrency,
+                                thread_name_prefix='stream') as executor:
+            futures = {
+                executor.submit(self._stream_category, category, prompt,
+                                checkpoint): category
+                for category, prompt in pending.items()
+            }
+
+            for future in as_completed(futures):
+                category = futures[future]
+
+                try:
+                    yield category, future.result()
+                except Exception as e:
+                    logger.error(f"[{category}] 流式生成失败: {e}")
+
+                    partial = checkpoint.partial(category)
+                    if partial:
+                        yield category, f"{partial}\n\n> 该分类生成中断, 以上为部分内容"
+                    else:
+                        self._packed[category] = []
+                        yield category, None
+
+    def _stream_category(self, category: str, prompt: str,
+                         checkpoint: 'BriefCheckpoint') -> str:
+        """流式生成单个分类摘要, 过程中定期写入检查点"""
+
+        key = None
+        if self.cache:
+            key = CompletionCache.make_key(CATEGORY_SYSTEM_PROMPT, prompt,
+                                           Config.OPENAI.map_max_tokens)
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.incr('openai.cache_hits')
+                logger.info(f"[{category}] 命中生成缓存")
+                return cached
+
+        start = time.monotonic()
+        first_token_at = None
+        chunks = []
+        unsaved = 0
+        usage = None
+
+        stream = self.resilience.call(
+            self.client.chat.completions.create,
+            model=Config.OPENAI.model,
+            messages=[{
+                "role": "system",
+                "content": CATEGORY_SYSTEM_PROMPT
+            }, {
+                "role": "user",
+                "content": prompt
+            }],
+            max_tokens=Config.OPENAI.map_max_tokens,
+            temperature=Config.OPENAI.temperature,
+            stream=True,
+            stream_options={'include_usage': True})
+
+        for chunk in stream:
+            # 用量在最后一个 chunk 中返回, 该 chunk 的 choices 为空
+            usage = getattr(chunk, 'usage', None) or usage
+
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+                metrics.observe('openai.first_token', first_token_at - start)
+                logger.info(f"[{category}] 首个 token 耗时 "
+                            f"{first_token_at - start:.2f}s")
+
+            chunks.append(delta)
+            unsaved += len(delta)
+
+            if unsaved >= 500:
+                checkpoint.save(category, ''.join(chunks), done=False)
+                unsaved = 0
+
+        text = ''.join(chunks).strip()
+
+        if usage is not None:
+            metrics.record_usage(usage)
+        else:
+            # 不支持 stream_options 的兼容接口不返回用量, 按文本估算
+            metrics.incr('openai.usage_estimated')
+            metrics.incr('openai.prompt_tokens',
+                         estimate_tokens(CATEGORY_SYSTEM_PROMPT + prompt))
+            metrics.incr('openai.completion_tokens', estimate_tokens(text))
+
+        checkpoint.save(category, text, done=True)
+        if self.cache and text:
+            self.cache.put(key, text)
+        metrics.incr('openai.api_calls')
+        metrics.observe('openai.completion', time.monotonic() - start)
+        logger.info(f"[{category}] 流式生成完成, 耗时 "
+                    f"{time.monotonic() - start:.2f}s")
+
+        return text
+
+    @staticmethod
+    def assemble(sections: Dict[str, str], failed: List[str]) -> str:
+        """拼装各分类摘要"""
+
+        parts = [f"# 今日全球新闻速览 ({datetime.now():%Y-%m-%d})\n"]
+
+        for category, section in sections.items():
+            if section:
+                parts.append(f"## {category}\n\n{section}\n")
+
+        if failed:
+            parts.append(f"> 以下分类暂未生成摘要: {'、'.join(failed)}\n")
+
+        return '\n'.join(parts)
+
+    def _group_by_category(
+            self, news_items: List[NewsItem]) -> Dict[str, List[NewsItem]]:
+        """按分类分组 (内容质量过滤见 QualityFilter)"""
+
+        categories = {}
+        for item in news_items:
+            categories.setdefault(item.category or '其他', []).append(item)
 
         return categories
 
-    def _build_prompt(self, categories: Dict[str, List[Dict]]) -> str:
-        """构建 Prompt"""
+    def _build_prompt(self, categories: Dict[str, List[NewsItem]]) -> str:
+        """构建 Prompt (按 token 预算装填新闻)"""
+
+        header = ("请从以下新闻数据中提取有价值的内容生成每日简报。\n\n"
+                  "要求:\n"
+                  "1. 只处理 content 字段有实质内容的新闻\n"
+                  "2. 如果 content 是网站首页描述或宣传文案,直接跳过\n"
+                  "3. 每个分类至少需要 2 条有效新闻才输出\n"
+                  "4. 每条新闻包含: 标题(加粗)、核心内容摘要(2-3句)、原文链接\n"
+                  "5. 如果某个分类没有足够有效新闻,直接跳过该分类\n\n"
+                  "---\n\n")
 
-        prompt = "请从以下新闻数据中提取有价值的内容生成每日简报。\n\n"
-        prompt += "要求:\n"
-        prompt += "1. 只处理 content 字段有实质内容的新闻\n"
-        prompt += "2. 如果 content 是网站首页描述或宣传文案,直接跳过\n"
-        prompt += "3. 每个分类至少需要 2 条有效新闻才输出\n"
-        prompt += "4. 每条新闻包含: 标题(加粗)、核心内容摘要(2-3句)、原文链接\n"
-        prompt += "5. 如果某个分类没有足够有效新闻,直接跳过该分类\n\n"
-        prompt += "---\n\n"
+        parts = [header]
+        remaining = Config.OPENAI.prompt_token_budget - estimate_tokens(header)
 
         for category, items in categories.items():
+            self._packed[category] = []
             if len(items) < 2:
                 continue
 
-            prompt += f"## {category}\n\n"
+            budget = min(Config.OPENAI.category_token_budget, remaining)
+            section, used = self._pack_category(category, items, budget)
 
-            for idx, item in enumerate(items[:10], 1):
-                title = item.get('title', '无标题')
-                content = item.get('content', '')
-                url = item.get('url', '')
-
-                prompt += f"{idx}. 标题: {title}\n"
-                prompt += f"   内容摘要: {content[:500]}\n"
+            if section is None:
+                logger.warning(f"[{category}] token 预算不足, 跳过该分类")
+                continue
 
-                if url:
-                    prompt += f"   原文链接: {url}\n"
+            parts.append(section)
+            remaining -= used
 
-                prompt += "\n"
+        prompt = ''.join(parts)
+        logger.info(f"Prompt 预估 {Config.OPENAI.prompt_token_budget - remaining}"
+                    f" tokens (预算 {Config.OPENAI.prompt_token_budget})")
 
         return prompt
+
+    def _pack_category(self, category: str, items: List[NewsItem],
+                       budget: int) -> Tuple[Optional[str], int]:
+        """按排序结果在预算内装填单个分类, 不足 2 条时返回 None
+
+        排序结果是 MMR 的挑选顺序, 预算不足跳过某条时由后面相似度低的新闻补上
+        """
+
+        heading = f"## {category}\n\n"
+        used = estimate_tokens(heading)
+        entries = []
+        packed = []
+
+        for item in self.ranker.rank(items):
+            if len(entries) >= Config.OPENAI.max_items_per_category:
+                break
+
+            entry = self._format_item(len(entries) + 1, item)
+            cost = estimate_tokens(entry)
+
+            if used + cost > budget:
+                continue
+
+            entries.append(entry)
+            packed.append(item)
+            used += cost
+
+        metrics.record_filter('prompt_pack', len(items), len(entries))
+
+        if len(entries) < 2:
+            return None, 0
+
+        self._packed[category] = packed
+        return heading + ''.join(entries), used
+
+    @staticmethod
+    def _format_item(idx: int, item: NewsItem) -> str:
+        """格式化单条新闻"""
+
+        lines = [
+            f"{idx}. 标题: {item.title or '无标题'}\n",
+            f"   内容摘要: {item.content[:Config.OPENAI.item_max_chars]}\n"
+        ]
+
+        if item.url:
+            lines.append(f"   原文链接: {item.url}\n")
+
+        lines.append("\n")
+        return ''.join(lines)
+
+
+class BriefCheckpoint:
+    """分类摘要检查点, 流式生成中断时保留已生成的内容, 重跑时复用已完成的分类"""
+
+    def __init__(self, path: str, prompts: Dict[str, str]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._hashes = {
+            category: hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+            for category, prompt in prompts.items()
+        }
+
+        self._entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"检查点读取失败: {e}")
+                saved = {}
+
+            # 只保留 Prompt 未变化的分类
+            self._entries = {
+                category: entry
+                for category, entry in saved.items()
+                if entry.get('prompt_hash') == self._hashes.get(category)
+            }
+
+    def completed(self, category: str) -> Optional[str]:
+        entry = self._entries.get(category)
+        if entry and entry.get('done'):
+            return entry['text']
+        return None
+
+    def partial(self, category: str) -> str:
+        entry = self._entries.get(category)
+        return entry['text'].strip() if entry else ''
+
+    def save(self, category: str, text: str, done: bool):
+        with self._lock:
+            self._entries[category] = {
+                'prompt_hash': self._hashes.get(category),
+                'text': text,
+                'done': done
+            }
+
+            if self.path:
+                atomic_write(self.path,
+                             json.dumps(self._entries, ensure_ascii=False))
+
+
+class CompletionCache(SqliteCache):
+    """LLM 生成结果磁盘缓存 (sqlite, TTL + LRU 淘汰), 推送失败后重跑不再重复调用"""
+
+    def __init__(self, path: str, ttl: int, max_entries: int):
+        super().__init__(path, 'completion', 'text', ttl, max_entries)
+
+    @staticmethod
+    def make_key(system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        """由模型、Prompt 和生成参数生成缓存键"""
+
+        payload = json.dumps(
+            {
+                'model': Config.OPENAI.model,
+                'system': system_prompt,
+                'user': user_prompt,
+                'temperature': Config.OPENAI.temperature,
+                'max_tokens': max_tokens
+            },
+            sort_keys=True,
+            ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LastGoodBrief:
+    """最近一次成功生成的简报, LLM 不可用时用作兜底
+
+    按简报覆盖的分类集合分别保存, 分时段推送不同分类时, 兜底只使用同一组分类的简报
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @staticmethod
+    def scope(categories: Iterable[str]) -> str:
+        return ','.join(sorted(set(categories)))
+
+    def save(self, text: str, categories: Iterable[str]):
+        if not self.path:
+            return
+
+        cutoff = time.time() - Config.OPENAI.fallback_max_age * 3600
+        briefs = {
+            scope: saved
+            for scope, saved in self._read().items()
+            if saved['generated_at'] >= cutoff
+        }
+        briefs[self.scope(categories)] = {
+            'text': text,
+            'generated_at': time.time()
+        }
+
+        atomic_write(self.path, json.dumps(briefs, ensure_ascii=False))
+
+    def load(self, max_age_hours: float,
+             categories: Iterable[str]) -> Optional[str]:
+        """读取同一组分类未超过 max_age_hours 的简报, 开头附上生成时间说明"""
+
+        saved = self._read().get(self.scope(categories))
+        if saved is None:
+            return None
+
+        if time.time() - saved['generated_at'] > max_age_hours * 3600:
+            return None
+
+        generated_at = datetime.fromtimestamp(saved['generated_at'])
+        return (f"> AI 服务暂时不可用, 以下为 {generated_at:%Y-%m-%d %H:%M} "
+                f"生成的简报\n\n{saved['text']}")
+
+    def _read(self) -> Dict[str, Dict]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                briefs = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"历史简报读取失败: {e}")
+            return {}
+
+        # 旧版本只保存一份简报, 不知道覆盖哪些分类, 不再使用
+        return {} if 'text' in briefs else briefs
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数: 中日韩字符约 1 token/字, 其余约 4 字符/token"""
+
+    cjk = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk + 3) // 4
@@ -0,0 +1,284 @@
+"""本地模拟服务: Tavily 搜索、OpenAI 兼容接口、SMTP 收件箱、PushPlus
+
+每个服务都可以配置延迟、错误率和返回数据量, 供基准测试使用, 不消耗真实 API 额度。
+"""
+import base64
+import json
+import random
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+@dataclass
+class ServiceProfile:
+    latency: float = 0.05  # 平均延迟(秒)
+    jitter: float = 0.5  # 延迟抖动比例
+    error_rate: float = 0.0
+    payload_size: int = 5  # Tavily 每次返回条数 / OpenAI 每个分类生成条数
+    content_chars: int = 800  # 单条内容长度
+
+    def wait(self):
+        delay = self.latency * (1 + random.uniform(-self.jitter, self.jitter))
+        time.sleep(max(delay, 0))
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    profile: ServiceProfile = ServiceProfile()
+    requests_served = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b'{}'
+        return json.loads(body or b'{}')
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        type(self).requests_served += 1
+        payload = self._read_json()
+        self.profile.wait()
+
+        if self.profile.should_fail():
+            self._send_json(500, {'error': 'injected failure'})
+            return
+
+        self.handle_request(payload)
+
+    def handle_request(self, payload: Dict):
+        raise NotImplementedError
+
+
+def _lorem(words: int, seed: str) -> str:
+    rng = random.Random(seed)
+    vocabulary = ('market policy team match minister league result growth '
+                  'defense chip model launch report season player court '
+                  'election treaty budget export satellite transfer').split()
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+
+class TavilyHandler(_JsonHandler):
+    """模拟 Tavily /search"""
+
+    def handle_request(self, payload: Dict):
+        query = payload.get('query', '')
+        count = min(payload.get('max_results', 5), self.profile.payload_size)
+        now = datetime.now(timezone.utc)
+
+        results = []
+        for i in range(count):
+            seed = f"{query}-{i}"
+            published = now - timedelta(hours=random.Random(seed).randint(
+                0, 36))
+            results.append({
+                'title': f"{query} #{i}",
+                'url': (f"https://news{i % 7}.example.com/"
+                        f"{random.Random(seed).getrandbits(40)}"),
+                'content': _lorem(self.profile.content_chars // 6, seed),
+                'score': round(random.Random(seed).random(), 4),
+                'published_date': published.isoformat().replace('+00:00', 'Z')
+            })
+
+        self._send_json(200, {'query': query, 'results': results})
+
+
+class OpenAIHandler(_JsonHandler):
+    """模拟 OpenAI 兼容的 /chat/completions (支持 stream)"""
+
+    def handle_request(self, payload: Dict):
+        prompt = payload['messages'][-1]['content']
+        entries = [
+            f"**标题**: 新闻 {i}\n**摘要**: {_lorem(40, prompt[:50] + str(i))}\n"
+            f"**链接**: https://news.example.com/{i}\n"
+            for i in range(self.profile.payload_size)
+        ]
+        text = '\n'.join(entries)
+        usage = {
+            'prompt_tokens': len(prompt) // 4,
+            'completion_tokens': len(text) // 4,
+            'total_tokens': (len(prompt) + len(text)) // 4
+        }
+        base = {
+            'id': 'chatcmpl-bench',
+            'created': int(time.time()),
+            'model': payload.get('model', 'bench')
+        }
+
+        if not payload.get('stream'):
+            self._send_json(
+                200, {
+                    **base, 'object':
+                    'chat.completion',
+                    'choices': [{
+                        'index': 0,
+                        'message': {
+                            'role': 'assistant',
+                            'content': text
+                        },
+                        'finish_reason': 'stop'
+                    }],
+                    'usage':
+                    usage
+                })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+
+        for entry in entries:
+            chunk = {
+                **base, 'object':
+                'chat.completion.chunk',
+                'choices': [{
+                    'index': 0,
+                    'delta': {
+                        'content': entry + '\n'
+                    },
+                    'finish_reason': None
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            self.profile.wait()
+
+        if payload.get('stream_options', {}).get('include_usage'):
+            chunk = {**base, 'object': 'chat.completion.chunk',
+                     'choices': [], 'usage': usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class PushPlusHandler(_JsonHandler):
+    """模拟 PushPlus /send"""
+
+    def handle_request(self, payload: Dict):
+        self._send_json(200, {'code': 200, 'msg': '请求成功', 'data': 'bench'})
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """最小可用的 SMTP 收件服务, 接收并丢弃邮件"""
+
+    profile: ServiceProfile = ServiceProfile()
+    messages_received = 0
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def _readline(self) -> str:
+        return self.rfile.readline().decode('utf-8', 'replace').rstrip('\r\n')
+
+    def handle(self):
+        self._reply('220 localhost bench smtp')
+
+        while True:
+            line = self._readline()
+            command = line[:4].upper()
+
+            if command in ('EHLO', 'HELO'):
+                self._reply('250-localhost')
+                self._reply('250 AUTH PLAIN LOGIN')
+            elif command == 'AUTH':
+                if line.upper().startswith('AUTH LOGIN'):
+                    self._reply('334 ' + base64.b64encode(b'Username:').decode())
+                    self._readline()
+                    self._reply('334 ' + base64.b64encode(b'Password:').decode())
+                    self._readline()
+                self._reply('235 Authentication successful')
+            elif command in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif command == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw or raw.rstrip(b'\r\n') == b'.':
+                        break
+                self.profile.wait()
+                if self.profile.should_fail():
+                    self._reply('554 injected failure')
+                else:
+                    type(self).messages_received += 1
+                    self._reply('250 OK queued')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            elif not line:
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeServices:
+    """启动全部模拟服务, 并给出指向它们的环境变量"""
+
+    def __init__(self, profiles: Dict[str, ServiceProfile]):
+        self.profiles = profiles
+        self._servers: List = []
+
+    def start(self) -> Dict[str, str]:
+        tavily = self._serve_http(TavilyHandler, self.profiles['tavily'])
+        openai = self._serve_http(OpenAIHandler, self.profiles['openai'])
+        pushplus = self._serve_http(PushPlusHandler,
+                                    self.profiles['pushplus'])
+
+        smtp_handler = type('SmtpSink', (SmtpSinkHandler, ),
+                            {'profile': self.profiles['smtp']})
+        smtp = _ThreadingTCPServer(('127.0.0.1', 0), smtp_handler)
+        self._start(smtp)
+        self.smtp_handler = smtp_handler
+
+        return {
+            'TAVILY_API_KEY': 'bench',
+            'TAVILY_BASE_URL': f"http://127.0.0.1:{tavily}/search",
+            'OPENAI_API_KEY': 'bench',
+            'OPENAI_BASE_URL': f"http://127.0.0.1:{openai}/v1",
+            'PUSHPLUS_API_URL': f"http://127.0.0.1:{pushplus}/send",
+            'PUSHPLUS_TOKEN': 'bench',
+            'EMAIL_SENDER': 'bench@example.com',
+            'EMAIL_PASSWORD': 'bench',
+            'EMAIL_RECEIVER': 'reader@example.com',
+            'EMAIL_SMTP_SERVER': '127.0.0.1',
+            'EMAIL_SMTP_PORT': str(smtp.server_address[1]),
+            'EMAIL_SMTP_SSL': 'false'
+        }
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def _serve_http(self, handler, profile: ServiceProfile) -> int:
+        handler_class = type(handler.__name__, (handler, ), {
+            'profile': profile,
+            'requests_served': 0
+        })
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        server.daemon_threads = True
+        self._start(server)
+        return server.server_address[1]
+
+    def _start(self, server):
+        self._servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
@@ -0,0 +1,202 @@
+"""离线基准测试: 用本地模拟服务驱动完整的新闻聚合流程
+
+用法 (在仓库根目录):
+    python -m benchmarks.run_benchmark --categories 20 --queries 10
+    python -m benchmarks.run_benchmark --mode async --tavily-error-rate 0.05
+    python -m benchmarks.run_benchmark --replay .cache/runs/<运行 ID>/search.jsonl.gz
+
+输出各阶段吞吐、延迟分位数和内存峰值, 可用 --output 保存为 JSON 便于跨版本对比。
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict
+
+from benchmarks.fake_services import FakeServices, ServiceProfile
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='新闻聚合离线基准测试')
+    parser.add_argument('--mode',
+                        choices=['sequential', 'async'],
+                        default='sequential')
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=10, help='每个分类的查询数')
+    parser.add_argument('--results', type=int, default=5, help='每个查询返回条数')
+    parser.add_argument('--content-chars', type=int, default=800)
+    parser.add_argument('--tavily-latency', type=float, default=0.2)
+    parser.add_argument('--tavily-error-rate', type=float, default=0.0)
+    parser.add_argument('--openai-latency', type=float, default=1.0)
+    parser.add_argument('--openai-error-rate', type=float, default=0.0)
+    parser.add_argument('--smtp-latency', type=float, default=0.1)
+    parser.add_argument('--pushplus-latency', type=float, default=0.1)
+    parser.add_argument('--subscribers',
+                        type=int,
+                        default=0,
+                        help='邮件订阅者数量, 一半只订阅第一个分类')
+    parser.add_argument('--memory',
+                        action='store_true',
+                        help='用 tracemalloc 统计各阶段内存峰值 (会明显拖慢 CPU 密集阶段)')
+    parser.add_argument('--replay',
+                        help='用运行产物中的新闻 (如 search.jsonl.gz) 代替搜索, '
+                        '从过滤阶段开始测试')
+    parser.add_argument('--output', help='保存 JSON 结果的路径')
+    return parser.parse_args()
+
+
+def build_queries(categories: int, queries: int) -> Dict:
+    return {
+        f"分类{c:03d}": [f"bench topic {c} query {q}" for q in range(queries)]
+        for c in range(categories)
+    }
+
+
+def write_subscribers(path: str, count: int, first_category: str):
+    subscribers = [{
+        'email': f"reader{i}@example.com",
+        **({
+            'categories': [first_category]
+        } if i % 2 else {})
+    } for i in range(count)]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(subscribers, f, ensure_ascii=False)
+
+
+def measure(stage: str, func, results: Dict):
+    """执行一个阶段并记录耗时与内存峰值"""
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    value = func()
+    results[stage] = {
+        'seconds': round(time.perf_counter() - start, 4),
+        'peak_mb': (round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+                    if tracing else None)
+    }
+    return value
+
+
+def main():
+    args = parse_args()
+
+    services = FakeServices({
+        'tavily':
+        ServiceProfile(latency=args.tavily_latency,
+                       error_rate=args.tavily_error_rate,
+                       payload_size=args.results,
+                       content_chars=args.content_chars),
+        'openai':
+        ServiceProfile(latency=args.openai_latency,
+                       error_rate=args.openai_error_rate),
+        'smtp':
+        ServiceProfile(latency=args.smtp_latency),
+        'pushplus':
+        ServiceProfile(latency=args.pushplus_latency)
+    })
+    workdir = tempfile.mkdtemp(prefix='news_bench_')
+
+    queries = build_queries(args.categories, args.queries)
+
+    # 配置在首次访问时读取环境变量, 必须先设置再运行业务代码
+    os.environ.update(services.start())
+    if args.subscribers:
+        subscribers_path = os.path.join(workdir, 'subscribers.json')
+        write_subscribers(subscribers_path, args.subscribers, next(iter(queries)))
+        os.environ['EMAIL_SUBSCRIBERS_PATH'] = subscribers_path
+
+    os.environ.update({
+        'PIPELINE_MODE': args.mode,
+        'TAVILY_CACHE_PATH': '',
+        'FETCHER_CACHE_PATH': '',
+        'DEDUP_INDEX_PATH': os.path.join(workdir, 'dedup.sqlite'),
+        'OPENAI_CHECKPOINT_PATH': '',
+        'OPENAI_CACHE_PATH': '',
+        'DELIVERY_OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite'),
+        'PLANNER_STATS_PATH': os.path.join(workdir, 'query_stats.sqlite'),
+        'OPENAI_LAST_BRIEF_PATH': os.path.join(workdir, 'last_brief.json'),
+        'METRICS_REPORT_DIR': os.path.join(workdir, 'reports')
+    })
+
+    from config import Config
+    from main import NewsAggregator
+    from metrics import metrics
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    Config.get_search_queries = staticmethod(lambda categories=None: queries)
+    Config.TAVILY.max_results = args.results
+
+    if args.memory:
+        tracemalloc.start()
+    stages = {}
+    metrics.reset()
+
+    aggregator = measure('init', NewsAggregator, stages)
+
+    if args.replay:
+        from run_artifacts import read_items
+        replayed = read_items(args.replay)
+        news_items = measure('filter_news',
+                             lambda: aggregator.filter_news(replayed), stages)
+        measure('process_and_send',
+                lambda: aggregator.process_and_send(news_items), stages)
+    elif args.mode == 'async':
+        measure('pipeline', aggregator.run_pipeline, stages)
+    else:
+        news_items = measure('collect_news', aggregator.collect_news, stages)
+        measure('process_and_send',
+                lambda: aggregator.process_and_send(news_items), stages)
+
+    if args.memory:
+        tracemalloc.stop()
+    services.stop()
+
+    report = metrics.report()
+    total_queries = args.categories * args.queries
+    total_seconds = sum(stage['seconds'] for stage in stages.values())
+    search_filter = report['filters'].get('min_content', {'in': 0})
+
+    result = {
+        'args': vars(args),
+        'stages': stages,
+        'throughput': {
+            'queries_per_second': round(total_queries / total_seconds, 2),
+            'items_per_second': round(search_filter['in'] / total_seconds, 2)
+        },
+        'latency': report['stages'],
+        'counters': report['counters'],
+        'filters': report['filters'],
+        'emails_received': services.smtp_handler.messages_received
+    }
+
+    print(f"\n模式: {args.mode}  查询: {total_queries}  "
+          f"搜索结果: {search_filter['in']} 条")
+    print(f"{'阶段':<20}{'耗时(s)':>10}{'内存峰值(MB)':>16}")
+    for stage, stats in stages.items():
+        peak = '-' if stats['peak_mb'] is None else f"{stats['peak_mb']:.2f}"
+        print(f"{stage:<20}{stats['seconds']:>10.3f}{peak:>16}")
+
+    print(f"\n{'调用':<32}{'次数':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<32}{stats['count']:>6}{stats['p50']:>9.3f}"
+              f"{stats['p95']:>9.3f}{stats['max']:>9.3f}")
+
+    print(f"\n吞吐: {result['throughput']['queries_per_second']} 查询/s, "
+          f"{result['throughput']['items_per_second']} 条/s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
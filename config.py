@@ -1,51 +1,318 @@
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
 import os
-from dotenv import load_dotenv
 from datetime import datetime
 
-load_dotenv()
+_env_loaded = False
+
+
+def load_env(path: Optional[str] = None):
+    """加载 .env, 只加载一次; 已存在的环境变量优先"""
+
+    global _env_loaded
+    if _env_loaded:
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv(path)
+    _env_loaded = True
+
+
+def env(name: str, default: str = '', cast: Callable = str):
+    """从环境变量取默认值的字段, 实例化配置时才读取"""
+
+    def factory():
+        value = os.getenv(name, default).strip()
+        if cast is bool:
+            return value.lower() == 'true'
+        try:
+            return cast(value)
+        except ValueError:
+            raise ValueError(f"{name} 格式错误: {value!r}") from None
+
+    return field(default_factory=factory)
 
 
 @dataclass
 class TavilyConfig:
-    api_key: str = os.getenv('TAVILY_API_KEY', '')
+    api_key: str = env('TAVILY_API_KEY')
+    base_url: str = env('TAVILY_BASE_URL')  # 留空使用官方地址
     search_depth: str = 'advanced'  # 改为 advanced 获取更多内容
     max_results: int = 5  # 每个查询 5 条结果
     days: int = 1  # 最近 1 天
+    concurrency: int = env('TAVILY_CONCURRENCY', '5', int)  # 并发查询数, 1 为串行
+    query_timeout: float = env('TAVILY_QUERY_TIMEOUT', '30', float)  # 单次查询超时(秒)
+    cache_path: str = env('TAVILY_CACHE_PATH', '.cache/tavily_cache.sqlite')  # 留空关闭缓存
+    cache_ttl: int = env('TAVILY_CACHE_TTL', '3600', int)  # 缓存有效期(秒)
+    cache_max_entries: int = env('TAVILY_CACHE_MAX_ENTRIES', '2000', int)
 
 
 @dataclass
 class OpenAIConfig:
-    api_key: str = os.getenv('OPENAI_API_KEY', '')
-    base_url: str = os.getenv('OPENAI_BASE_URL', '').strip()
-    model: str = os.getenv('OPENAI_MODEL', 'gemini-3-pro-all').strip()
+    api_key: str = env('OPENAI_API_KEY')
+    base_url: str = env('OPENAI_BASE_URL')
+    model: str = env('OPENAI_MODEL', 'gemini-3-pro-all')
     max_tokens: int = 15000
     temperature: float = 0.2
+    prompt_token_budget: int = env('OPENAI_PROMPT_TOKEN_BUDGET', '12000', int)  # 输入 Prompt 总预算
+    category_token_budget: int = env('OPENAI_CATEGORY_TOKEN_BUDGET', '3000', int)  # 单分类预算
+    item_max_chars: int = 500  # 单条新闻内容截断长度
+    max_items_per_category: int = 10
+    summary_mode: str = env('OPENAI_SUMMARY_MODE', 'map_reduce')  # single / map_reduce
+    map_max_tokens: int = env('OPENAI_MAP_MAX_TOKENS', '3000', int)  # 单分类输出上限
+    map_concurrency: int = env('OPENAI_MAP_CONCURRENCY', '5', int)
+    stream: bool = env('OPENAI_STREAM', 'false', bool)  # 流式生成, 分类完成即推送
+    checkpoint_path: str = env('OPENAI_CHECKPOINT_PATH', '.cache/brief_checkpoint.json')
+    cache_path: str = env('OPENAI_CACHE_PATH', '.cache/completion_cache.sqlite')  # 留空关闭缓存
+    cache_ttl: int = env('OPENAI_CACHE_TTL', '86400', int)  # 相同 Prompt 在有效期内不重复调用
+    cache_max_entries: int = env('OPENAI_CACHE_MAX_ENTRIES', '500', int)
+    last_brief_path: str = env('OPENAI_LAST_BRIEF_PATH', '.cache/last_brief.json')  # 留空关闭兜底
+    fallback_max_age: int = env('OPENAI_FALLBACK_MAX_AGE', '24', int)  # 兜底简报最长使用时间(小时)
 
 
 @dataclass
 class EmailConfig:
-    sender: str = os.getenv('EMAIL_SENDER', '').strip()
-    password: str = os.getenv('EMAIL_PASSWORD', '').strip()
-    receiver: str = os.getenv('EMAIL_RECEIVER', '').strip()
-    smtp_server: str = os.getenv('EMAIL_SMTP_SERVER', 'smtp.126.com').strip()
-    smtp_port: int = int(os.getenv('EMAIL_SMTP_PORT', '465'))
+    sender: str = env('EMAIL_SENDER')
+    password: str = env('EMAIL_PASSWORD')
+    receiver: str = env('EMAIL_RECEIVER')
+    smtp_server: str = env('EMAIL_SMTP_SERVER', 'smtp.126.com')
+    smtp_port: int = env('EMAIL_SMTP_PORT', '465', int)
+    use_ssl: bool = env('EMAIL_SMTP_SSL', 'true', bool)
+    # 订阅者列表 JSON: [{"email": "...", "categories": ["科技", "足球"]}], 不写 categories 表示全部分类
+    # 留空时发送给 EMAIL_RECEIVER (可用逗号分隔多个地址)
+    subscribers_path: str = env('EMAIL_SUBSCRIBERS_PATH')
+    pool_size: int = env('EMAIL_POOL_SIZE', '3', int)  # 并行 SMTP 连接数
+    messages_per_connection: int = env('EMAIL_MESSAGES_PER_CONNECTION', '50', int)  # 单个连接发送多少封后重连
+    rate_limit: float = env('EMAIL_RATE_LIMIT', '5', float)  # 每秒最多发送封数, 0 为不限
+
+
+@dataclass
+class PushPlusConfig:
+    api_url: str = env('PUSHPLUS_API_URL', 'http://www.pushplus.plus/send')
+    token: str = env('PUSHPLUS_TOKEN')
+    topic: str = env('PUSHPLUS_TOPIC')
+    template: str = env('PUSHPLUS_TEMPLATE', 'html')
+    channel: str = env('PUSHPLUS_CHANNEL', 'wechat')
+    per_section: bool = env('PUSHPLUS_PER_SECTION', 'false', bool)  # 流式模式下按分类逐条推送
+
+
+@dataclass
+class DeliveryConfig:
+    outbox_path: str = env('DELIVERY_OUTBOX_PATH', '.cache/outbox.sqlite')
+    max_attempts: int = env('DELIVERY_MAX_ATTEMPTS', '5', int)  # 单个渠道最多尝试次数
+    retry_interval: int = env('DELIVERY_RETRY_INTERVAL', '300', int)  # 失败重试基准间隔(秒), 按次数翻倍
+    lease_seconds: int = 900  # 发送中的消息超过该时间未完成视为进程中断, 可被重新领取
+    webhook_urls: str = env('WEBHOOK_URLS')  # 逗号分隔, 以 JSON POST 推送
+    webhook_timeout: int = env('WEBHOOK_TIMEOUT', '10', int)
+
+
+@dataclass
+class PipelineConfig:
+    mode: str = env('PIPELINE_MODE', 'sequential')  # sequential / async
+    queue_size: int = env('PIPELINE_QUEUE_SIZE', '100', int)  # 阶段间队列容量
+    fetch_enabled: bool = env('PIPELINE_FETCH_ENABLED', 'false', bool)  # 抓取原文补全摘要
+    fetch_min_chars: int = 300  # 内容短于此长度时抓取原文
+    fetch_workers: int = env('PIPELINE_FETCH_WORKERS', '8', int)
+    fetch_timeout: float = 15
+    summarize_timeout: float = env('PIPELINE_SUMMARIZE_TIMEOUT', '180', float)
+
+
+@dataclass
+class ArtifactConfig:
+    path: str = env('ARTIFACTS_PATH', '.cache/runs')  # 每次运行各阶段产物, 用于失败后恢复; 留空关闭
+    retention_days: int = env('ARTIFACTS_RETENTION_DAYS', '7', int)
+
+
+@dataclass
+class PlannerConfig:
+    stats_path: str = env('PLANNER_STATS_PATH', '.cache/query_stats.sqlite')  # 查询产出统计, 留空关闭规划
+    max_calls: int = env('PLANNER_MAX_CALLS', '0', int)  # 每次运行最多执行的查询数, 0 为不限
+    min_runs: int = 3  # 累计运行次数达到后才按产出调整
+    min_yield: float = env('PLANNER_MIN_YIELD', '0.5', float)  # 平均有效产出低于此值的查询被跳过
+    explore_interval: int = env('PLANNER_EXPLORE_INTERVAL', '5', int)  # 连续跳过该次数后重新试探
+    max_results_cap: int = 10  # 高产出查询最多取多少条结果
+
+
+@dataclass
+class FetcherConfig:
+    timeout: int = env('FETCHER_TIMEOUT', '10', int)
+    max_bytes: int = env('FETCHER_MAX_BYTES', '524288', int)  # 单页最多读取字节数
+    max_workers: int = env('FETCHER_MAX_WORKERS', '16', int)
+    per_host: int = env('FETCHER_PER_HOST', '4', int)  # 单域名并发连接上限
+    cache_path: str = env('FETCHER_CACHE_PATH', '.cache/content_cache.sqlite')  # 留空关闭缓存
+    cache_ttl: int = env('FETCHER_CACHE_TTL', '1800', int)  # 有效期内不发请求
+    cache_max_entries: int = env('FETCHER_CACHE_MAX_ENTRIES', '5000', int)
+
+
+@dataclass
+class IncrementalConfig:
+    enabled: bool = env('INCREMENTAL_ENABLED', 'false', bool)  # 只处理上次推送后的新内容
+    path: str = env('INCREMENTAL_PATH', '.cache/watermarks.sqlite')
+    overlap_seconds: int = 600  # 水位回退余量, 容忍发布时间的误差
+    seen_retention_days: int = env('INCREMENTAL_RETENTION_DAYS', '3', int)
+
+
+@dataclass
+class MetricsConfig:
+    report_dir: str = env('METRICS_REPORT_DIR', '.cache/reports')
+    prometheus_path: str = env('METRICS_PROMETHEUS_PATH')  # node_exporter textfile 路径
+
+
+@dataclass
+class DedupConfig:
+    enabled: bool = env('DEDUP_ENABLED', 'true', bool)
+    index_path: str = env('DEDUP_INDEX_PATH', '.cache/dedup_index.sqlite')
+    mongo_uri: str = env('DEDUP_MONGO_URI')  # 配置后改用 MongoDB 存储
+    mongo_db: str = env('DEDUP_MONGO_DB', 'news_push')
+    expire_days: int = env('DEDUP_EXPIRE_DAYS', '7', int)  # 已推送记录保留天数
+    max_distance: int = 3  # SimHash 汉明距离阈值, 不超过即视为近似重复
+
+
+@dataclass
+class QualityConfig:
+    enabled: bool = env('QUALITY_ENABLED', 'true', bool)
+    # 屏蔽关键词, 逗号分隔, 命中即视为首页描述或宣传文案
+    blocked_keywords: str = env(
+        'QUALITY_BLOCKED_KEYWORDS',
+        'welcome to,homepage,official website,latest updates,follow us,subscribe')
+    rules_path: str = env('QUALITY_RULES_PATH')  # JSON 规则文件, 含 keywords / patterns
+    min_distinct_tokens: int = env('QUALITY_MIN_DISTINCT_TOKENS', '10', int)
+    max_boilerplate_ratio: float = env('QUALITY_MAX_BOILERPLATE_RATIO', '0.5', float)  # 短行(导航、按钮)字符占比上限
+    languages: str = env('QUALITY_LANGUAGES')  # 如 "zh,en", 留空不检查
+
+
+@dataclass
+class RankingConfig:
+    score_weight: float = env('RANKING_SCORE_WEIGHT', '0.6', float)  # Tavily 相关度
+    freshness_weight: float = env('RANKING_FRESHNESS_WEIGHT', '0.3', float)
+    domain_weight: float = env('RANKING_DOMAIN_WEIGHT', '0.1', float)
+    # 来源权重 0~1, 逗号分隔, 例: "reuters.com:1,bbc.com:0.9"; 未配置的来源为 0.5
+    domain_weights: str = env('RANKING_DOMAIN_WEIGHTS')
+    diversity: float = env('RANKING_DIVERSITY', '0.3', float)  # MMR 相似度惩罚, 0 为不考虑多样性
+
+
+@dataclass
+class ResilienceConfig:
+    max_retries: int = env('RETRY_MAX_RETRIES', '3', int)
+    base_delay: float = env('RETRY_BASE_DELAY', '1', float)  # 退避基准(秒), 按 2^n 增长并随机抖动
+    max_delay: float = env('RETRY_MAX_DELAY', '30', float)
+    failure_threshold: int = env('CIRCUIT_FAILURE_THRESHOLD', '5', int)  # 连续失败次数达到后熔断
+    reset_timeout: float = env('CIRCUIT_RESET_TIMEOUT', '60', float)  # 熔断冷却时间(秒)
+    tavily_rate: float = env('TAVILY_RATE_LIMIT', '5', float)  # 每秒请求数, 0 为不限
+    tavily_hedge_after: float = env('TAVILY_HEDGE_AFTER', '8', float)  # 超过该秒数未返回则发对冲请求, 0 关闭
+    openai_rate: float = env('OPENAI_RATE_LIMIT', '2', float)
+    pushplus_rate: float = env('PUSHPLUS_RATE_LIMIT', '1', float)
+
+
+@dataclass
+class ScheduleConfig:
+    # 多个计划用 ; 分隔, 每个计划为 "cron 表达式[@分类1,分类2]", 不写分类表示全部分类
+    # 例: "0 * * * *@足球,篮球;0 8 * * *@政治,科技,军事"; 留空则每天 SCHEDULE_TIME 运行一次
+    schedules: str = env('SCHEDULES')
+    timezone: str = env('SCHEDULE_TIMEZONE', 'Asia/Shanghai')
+    misfire_grace: int = env('SCHEDULE_MISFIRE_GRACE', '600', int)  # 错过触发后的补跑窗口(秒)
+
+
+class _Section:
+    """配置分组: 首次访问时加载 .env 并读取环境变量, 之后复用同一实例"""
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        section = owner._sections.get(self.name)
+        if section is None:
+            load_env()
+            section = owner._sections.setdefault(self.name, self.factory())
+        return section
 
 
 class Config:
-    TAVILY = TavilyConfig()
-    OPENAI = OpenAIConfig()
-    EMAIL = EmailConfig()
+    TAVILY = _Section(TavilyConfig)
+    OPENAI = _Section(OpenAIConfig)
+    EMAIL = _Section(EmailConfig)
+    PUSHPLUS = _Section(PushPlusConfig)
+    DELIVERY = _Section(DeliveryConfig)
+    PIPELINE = _Section(PipelineConfig)
+    ARTIFACTS = _Section(ArtifactConfig)
+    PLANNER = _Section(PlannerConfig)
+    FETCHER = _Section(FetcherConfig)
+    METRICS = _Section(MetricsConfig)
+    INCREMENTAL = _Section(IncrementalConfig)
+    DEDUP = _Section(DedupConfig)
+    QUALITY = _Section(QualityConfig)
+    RANKING = _Section(RankingConfig)
+    RESILIENCE = _Section(ResilienceConfig)
     SCHEDULE_TIME = '08:00'
+    SCHEDULE = _Section(ScheduleConfig)
+
+    _sections = {}
+
+    @classmethod
+    def validate(cls,
+                 stages: Iterable[str] = ('search', 'summarize',
+                                          'deliver')) -> List[str]:
+        """检查配置, 返回问题列表 (为空表示通过)
+
+        stages 为要执行的阶段: search / summarize / deliver, 只检查用得到的配置,
+        在调用外部服务之前发现问题。
+        """
+
+        problems = []
+        for name, attr in vars(cls).items():
+            if isinstance(attr, _Section):
+                try:
+                    getattr(cls, name)
+                except ValueError as e:
+                    problems.append(str(e))
+        if problems:
+            return problems
+
+        stages = set(stages)
+
+        if cls.PIPELINE.mode not in ('sequential', 'async'):
+            problems.append(f"PIPELINE_MODE 无效: {cls.PIPELINE.mode}")
+
+        if 'search' in stages:
+            if not cls.TAVILY.api_key:
+                problems.append("未配置 TAVILY_API_KEY")
+            if cls.TAVILY.concurrency < 1:
+                problems.append("TAVILY_CONCURRENCY 至少为 1")
+            if cls.QUALITY.rules_path and not os.path.isfile(
+                    cls.QUALITY.rules_path):
+                problems.append(
+                    f"QUALITY_RULES_PATH 不存在: {cls.QUALITY.rules_path}")
+
+        if 'summarize' in stages:
+            if not cls.OPENAI.api_key:
+                problems.append("未配置 OPENAI_API_KEY")
+            if cls.OPENAI.summary_mode not in ('single', 'map_reduce'):
+                problems.append(
+                    f"OPENAI_SUMMARY_MODE 无效: {cls.OPENAI.summary_mode}")
+
+        if 'deliver' in stages:
+            email = cls.EMAIL
+            if not (email.sender and email.password):
+                problems.append("未配置 EMAIL_SENDER / EMAIL_PASSWORD")
+            if email.subscribers_path:
+                if not os.path.isfile(email.subscribers_path):
+                    problems.append(
+                        f"EMAIL_SUBSCRIBERS_PATH 不存在: {email.subscribers_path}")
+            elif not email.receiver:
+                problems.append("未配置 EMAIL_RECEIVER 或 EMAIL_SUBSCRIBERS_PATH")
+
+        return problems
 
     # 优化后的搜索关键词（更具体的查询）
     @staticmethod
-    def get_search_queries() -> dict:
-        """动态生成搜索关键词"""
+    def get_search_queries(categories: Optional[List[str]] = None) -> dict:
+        """动态生成搜索关键词, 可只取部分分类"""
         today = datetime.now().strftime('%B %d %Y')
 
-        return {
+        queries = {
             '科技': [
                 f'AI breakthrough {today}', f'technology innovation {today}',
                 'latest tech news today'
@@ -68,3 +335,11 @@ class Config:
                 'NBA trade news today'
             ]
         }
+
+        if categories:
+            queries = {
+                category: items
+                for category, items in queries.items() if category in categories
+            }
+
+        return queries
@@ -7,53 +7,280 @@ FilePath: /news_push/content_fetcher.py
 Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查看配置 进行设置: https://github.com/OBKoro1/koro1FileHeader/wiki/%E9%85%8D%E7%BD%AE
 '''
 import logging
+import os
+import sqlite3
+import threading
+import time
 import requests
-from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from lxml.etree import ParserError
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
+from config import Config
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+_DROP_TAGS = ['script', 'style', 'nav', 'footer', 'aside']
+_TEXT_XPATH = './/p | .//h1 | .//h2 | .//h3'
+
+
+class HttpCache:
+    """网页正文缓存 (sqlite), 保存提取后的正文和 ETag / Last-Modified"""
+
+    def __init__(self, path: str, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS http_cache ('
+                           'url TEXT PRIMARY KEY, '
+                           'etag TEXT, '
+                           'last_modified TEXT, '
+                           'content TEXT, '
+                           'fetched_at REAL NOT NULL, '
+                           'accessed_at REAL NOT NULL)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_http_accessed '
+                           'ON http_cache (accessed_at)')
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, content, fetched_at '
+                'FROM http_cache WHERE url = ?', (url, )).fetchone()
+
+            if row is None:
+                return None
+
+            self._conn.execute(
+                'UPDATE http_cache SET accessed_at = ? WHERE url = ?',
+                (time.time(), url))
+            self._conn.commit()
+
+        etag, last_modified, content, fetched_at = row
+        return {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content': content,
+            'fresh': time.time() - fetched_at < self.ttl
+        }
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str],
+            content: Optional[str]):
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, content, now, now))
+            self._conn.execute(
+                'DELETE FROM http_cache WHERE url IN ('
+                'SELECT url FROM http_cache ORDER BY accessed_at DESC '
+                'LIMIT -1 OFFSET ?)', (self.max_entries, ))
+            self._conn.commit()
+
+    def refresh(self, url: str):
+        """304 时刷新抓取时间"""
+
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                'UPDATE http_cache SET fetched_at = ?, accessed_at = ? '
+                'WHERE url = ?', (now, now, url))
+            self._conn.commit()
+
 
 class ContentFetcher:
     """网页内容抓取器"""
 
-    def __init__(self, timeout: int = 10):
-        self.timeout = timeout
+    def __init__(self, timeout: int = None):
+        self.timeout = timeout or Config.FETCHER.timeout
+        self.max_bytes = Config.FETCHER.max_bytes
+        self.max_workers = Config.FETCHER.max_workers
         self.headers = {
             'User-Agent':
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
 
+        # 复用连接, 避免每个 URL 重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=self.max_workers,
+                              pool_maxsize=Config.FETCHER.per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+        self.stats = deque(maxlen=5000)  # 最近的单 URL 抓取耗时统计
+
+        self.cache = None
+        if Config.FETCHER.cache_path:
+            self.cache = HttpCache(Config.FETCHER.cache_path,
+                                   Config.FETCHER.cache_ttl,
+                                   Config.FETCHER.cache_max_entries)
+
+    @metrics.timed('fetcher.fetch')
     def fetch(self, url: str) -> Optional[str]:
         """抓取网页正文"""
-        try:
-            response = requests.get(url,
-                                    headers=self.headers,
-                                    timeout=self.timeout)
-            response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+        start = time.monotonic()
+        stat = {'url': url, 'status': None, 'bytes': 0, 'chars': 0}
 
-            for tag in soup(['script', 'style', 'nav', 'footer', 'aside']):
-                tag.decompose()
+        try:
+            cached = self.cache.get(url) if self.cache else None
 
-            article = soup.find('article') or soup.find('main') or soup.find(
-                'body')
+            if cached and cached['fresh']:
+                stat['cache'] = 'fresh'
+                metrics.incr('fetcher.cache_fresh')
+                return cached['content'] or None
 
-            if not article:
-                return None
+            headers = {}
+            if cached:
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
 
-            paragraphs = article.find_all(['p', 'h1', 'h2', 'h3'])
-            content = ' '.join([p.get_text().strip() for p in paragraphs])
+            with self._host_limit(url):
+                raw, response_headers = self._download(url, stat, headers)
 
-            content = ' '.join(content.split())
+            if stat['status'] == 304 and cached:
+                # 未修改, 直接复用缓存的正文, 不再解析
+                stat['cache'] = 'revalidated'
+                metrics.incr('fetcher.cache_revalidated')
+                self.cache.refresh(url)
+                return cached['content'] or None
 
-            if len(content) < 100:
-                return None
+            content = self._extract(raw)
+            content = content[:2000] if content and len(content) >= 100 else None
+
+            if self.cache:
+                self.cache.put(url, response_headers.get('ETag'),
+                               response_headers.get('Last-Modified'), content)
 
-            return content[:2000]
+            stat['chars'] = len(content) if content else 0
+            return content
 
         except Exception as e:
+            metrics.incr('fetcher.errors')
             logger.debug(f"抓取失败 {url}: {e}")
+            stat['error'] = str(e)
+            return None
+
+        finally:
+            stat['elapsed'] = time.monotonic() - start
+            self.stats.append(stat)
+
+    def fetch_many(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """并发抓取多个网页正文"""
+
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        if not unique_urls:
+            return {}
+
+        start = time.monotonic()
+        self.stats.clear()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='fetch') as executor:
+            contents = dict(
+                zip(unique_urls, executor.map(self.fetch, unique_urls)))
+
+        succeeded = sum(1 for content in contents.values() if content)
+        elapsed = sorted(stat['elapsed'] for stat in self.stats)
+        logger.info(f"抓取 {len(unique_urls)} 个网页, 成功 {succeeded} 个, "
+                    f"总耗时 {time.monotonic() - start:.2f}s, "
+                    f"中位 {elapsed[len(elapsed) // 2]:.2f}s, "
+                    f"最慢 {elapsed[-1]:.2f}s")
+
+        return contents
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        """单域名并发限制"""
+
+        host = urlparse(url).netloc.lower()
+
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(
+                    Config.FETCHER.per_host)
+            return self._host_limits[host]
+
+    def _download(self, url: str, stat: Dict,
+                  headers: Dict) -> Tuple[bytes, Dict]:
+        """流式下载, 超过 max_bytes 即停止读取"""
+
+        with self.session.get(url,
+                              headers=headers,
+                              timeout=self.timeout,
+                              stream=True) as response:
+            stat['status'] = response.status_code
+
+            if response.status_code == 304:
+                return b'', response.headers
+
+            response.raise_for_status()
+
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=16384):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.max_bytes:
+                    break
+
+        stat['bytes'] = size
+        metrics.incr('fetcher.bytes', size)
+        return b''.join(chunks), response.headers
+
+    @staticmethod
+    def _extract(raw: bytes) -> Optional[str]:
+        """提取正文, 优先使用 lxml, 失败时回退到 BeautifulSoup"""
+
+        try:
+            tree = lxml_html.fromstring(raw)
+        except (ParserError, ValueError):
+            return ContentFetcher._extract_with_bs4(raw)
+
+        for element in tree.xpath(' | '.join(f'//{tag}' for tag in _DROP_TAGS)):
+            element.drop_tree()
+
+        articles = (tree.xpath('//article') or tree.xpath('//main')
+                    or tree.xpath('//body'))
+        if not articles:
+            return None
+
+        paragraphs = articles[0].xpath(_TEXT_XPATH)
+        content = ' '.join(p.text_content().strip() for p in paragraphs)
+
+        return ' '.join(content.split())
+
+    @staticmethod
+    def _extract_with_bs4(raw: bytes) -> Optional[str]:
+        soup = BeautifulSoup(raw, 'html.parser')
+
+        for tag in soup(_DROP_TAGS):
+            tag.decompose()
+
+        article = soup.find('article') or soup.find('main') or soup.find(
+            'body')
+
+        if not article:
             return None
+
+        paragraphs = article.find_all(['p', 'h1', 'h2', 'h3'])
+        content = ' '.join([p.get_text().strip() for p in paragraphs])
+
+        return ' '.join(content.split())
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional
+
+# fromisoformat 与 RFC 2822 之外的常见格式
+_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+    '%d %b %Y %H:%M:%S',
+    '%d %b %Y',
+    '%d %B %Y',
+    '%b %d, %Y',
+    '%B %d, %Y',
+    '%Y年%m月%d日 %H:%M',
+    '%Y年%m月%d日',
+]
+
+
+@lru_cache(maxsize=4096)
+def parse_published(value: str) -> Optional[float]:
+    """解析发布时间为 UTC 时间戳, 无法解析时返回 None (结果缓存)"""
+
+    value = (value or '').strip()
+    if not value:
+        return None
+
+    parsed = None
+
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        pass
+
+    if parsed is None:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            pass
+
+    if parsed is None:
+        for fmt in _FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+
+    if parsed is None:
+        return None
+
+    # 没有时区信息的时间按 UTC 处理
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed.timestamp()
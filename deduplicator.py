@@ -0,0 +1,218 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Iterable, Optional, Tuple
+from config import Config
+from metrics import metrics
+from news_item import NewsItem, SIMHASH_BITS
+
+logger = logging.getLogger(__name__)
+
+BAND_COUNT = 4
+BAND_BITS = SIMHASH_BITS // BAND_COUNT
+
+
+def split_bands(fingerprint: int) -> Tuple[int, ...]:
+    """把指纹切成若干段, 汉明距离 < 段数时至少有一段完全相同"""
+
+    mask = (1 << BAND_BITS) - 1
+    return tuple(fingerprint >> (i * BAND_BITS) & mask
+                 for i in range(BAND_COUNT))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class SqliteDedupIndex:
+    """已推送新闻索引 (sqlite), 常驻模式下各次任务在不同线程中共用一个连接"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS pushed_news ('
+                           'url TEXT PRIMARY KEY, '
+                           'simhash TEXT NOT NULL, '
+                           'band0 INTEGER, band1 INTEGER, '
+                           'band2 INTEGER, band3 INTEGER, '
+                           'pushed_at REAL NOT NULL)')
+        for i in range(BAND_COUNT):
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_band{i} '
+                               f'ON pushed_news (band{i})')
+        self._conn.commit()
+
+    def has_url(self, url: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT 1 FROM pushed_news WHERE url = ?', (url, )).fetchone()
+        return row is not None
+
+    def candidates(self, bands: Tuple[int, ...]) -> List[int]:
+        where = ' OR '.join(f'band{i} = ?' for i in range(BAND_COUNT))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT simhash FROM pushed_news WHERE {where}',
+                bands).fetchall()
+        return [int(row[0], 16) for row in rows]
+
+    def add(self, records: Iterable[Tuple[str, int]], pushed_at: float):
+        rows = [(url, f'{fingerprint:016x}', *split_bands(fingerprint),
+                 pushed_at) for url, fingerprint in records]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO pushed_news '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+    def purge(self, before: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM pushed_news WHERE pushed_at < ?', (before, ))
+            self._conn.commit()
+        return cursor.rowcount
+
+
+class MongoDedupIndex:
+    """已推送新闻索引 (MongoDB)"""
+
+    def __init__(self, uri: str, database: str):
+        from pymongo import MongoClient, ASCENDING
+
+        self._collection = MongoClient(uri)[database]['pushed_news']
+        self._collection.create_index([('url', ASCENDING)], unique=True)
+        self._collection.create_index([('bands', ASCENDING)])
+        self._collection.create_index([('pushed_at', ASCENDING)])
+
+    def has_url(self, url: str) -> bool:
+        return self._collection.count_documents({'url': url}, limit=1) > 0
+
+    def candidates(self, bands: Tuple[int, ...]) -> List[int]:
+        keys = [f'{i}:{band}' for i, band in enumerate(bands)]
+        cursor = self._collection.find({'bands': {
+            '$in': keys
+        }}, {'simhash': 1})
+        return [int(doc['simhash'], 16) for doc in cursor]
+
+    def add(self, records: Iterable[Tuple[str, int]], pushed_at: float):
+        from pymongo import UpdateOne
+
+        operations = [
+            UpdateOne({'url': url}, {
+                '$set': {
+                    'simhash':
+                    f'{fingerprint:016x}',
+                    'bands': [
+                        f'{i}:{band}'
+                        for i, band in enumerate(split_bands(fingerprint))
+                    ],
+                    'pushed_at':
+                    pushed_at
+                }
+            },
+                      upsert=True) for url, fingerprint in records
+        ]
+        if operations:
+            self._collection.bulk_write(operations, ordered=False)
+
+    def purge(self, before: float) -> int:
+        result = self._collection.delete_many({'pushed_at': {'$lt': before}})
+        return result.deleted_count
+
+
+class NewsDeduplicator:
+    """新闻去重: URL 精确去重 + 内容 SimHash 近似去重, 并跨运行排除已推送新闻"""
+
+    def __init__(self):
+        self.max_distance = Config.DEDUP.max_distance
+
+        if Config.DEDUP.mongo_uri:
+            self.index = MongoDedupIndex(Config.DEDUP.mongo_uri,
+                                         Config.DEDUP.mongo_db)
+            logger.info("去重索引: MongoDB")
+        else:
+            self.index = SqliteDedupIndex(Config.DEDUP.index_path)
+            logger.info(f"去重索引: {Config.DEDUP.index_path}")
+
+        expired = self.index.purge(time.time() -
+                                   Config.DEDUP.expire_days * 86400)
+        if expired:
+            logger.info(f"清理过期去重记录 {expired} 条")
+
+    def deduplicate(self,
+                    news_items: List[NewsItem],
+                    batch: Optional[Dict] = None) -> List[NewsItem]:
+        """去掉批内重复以及历史已推送的新闻
+
+        分批调用时传入同一个 batch (见 new_batch), 批内去重跨调用生效
+        """
+
+        batch = batch if batch is not None else self.new_batch()
+        seen_urls = batch['urls']
+        seen_bands = batch['bands']
+        unique = []
+        dropped_batch = 0
+        dropped_history = 0
+
+        for item in news_items:
+            url = item.canonical_url
+            fingerprint = item.fingerprint
+            bands = split_bands(fingerprint)
+
+            if url and url in seen_urls or self._near(fingerprint, bands,
+                                                      seen_bands):
+                dropped_batch += 1
+                logger.debug(f"批内重复: {item.title}")
+                continue
+
+            if url and self.index.has_url(url) or self._near_history(
+                    fingerprint, bands):
+                dropped_history += 1
+                logger.debug(f"已推送过: {item.title}")
+                continue
+
+            if url:
+                seen_urls.add(url)
+            for i, band in enumerate(bands):
+                seen_bands.setdefault((i, band), []).append(fingerprint)
+
+            unique.append(item)
+
+        metrics.record_filter('dedup', len(news_items), len(unique))
+        logger.info(f"去重: 输入 {len(news_items)} 条, 批内重复 {dropped_batch} 条, "
+                    f"历史重复 {dropped_history} 条, 保留 {len(unique)} 条")
+
+        return unique
+
+    @staticmethod
+    def new_batch() -> Dict:
+        """批内去重状态"""
+
+        return {'urls': set(), 'bands': {}}
+
+    def mark_pushed(self, news_items: List[NewsItem]):
+        """记录已推送的新闻"""
+
+        records = [(item.canonical_url, item.fingerprint)
+                   for item in news_items if item.canonical_url]
+        self.index.add(records, time.time())
+        logger.info(f"写入去重索引 {len(records)} 条")
+
+    def _near(self, fingerprint: int, bands: Tuple[int, ...],
+              seen_bands: Dict) -> bool:
+        for i, band in enumerate(bands):
+            for other in seen_bands.get((i, band), ()):
+                if hamming_distance(fingerprint, other) <= self.max_distance:
+                    return True
+        return False
+
+    def _near_history(self, fingerprint: int, bands: Tuple[int,
+                                                             ...]) -> bool:
+        return any(
+            hamming_distance(fingerprint, other) <= self.max_distance
+            for other in self.index.candidates(bands))
@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 渠道发送函数: (标题, Markdown 内容, 幂等键, 已送达的收件人) -> 是否成功
+# 多收件人的渠道返回 {收件人: 是否成功}, 并跳过已送达的收件人, 重试时只补发失败的
+Sender = Callable[[str, str, str, FrozenSet[str]], Union[bool, Dict[str, bool]]]
+
+_SENT_RETENTION = 7 * 86400  # 已发送记录保留时间(秒)
+
+
+class Outbox:
+    """待推送消息的本地持久化队列 (sqlite)
+
+    消息先落库再发送, 每个 (渠道, 标题, 内容) 对应一个幂等键: 已发送的不会再发,
+    进程中断时未完成的消息由重试任务接着发送。
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS outbox ('
+                           'key TEXT PRIMARY KEY, '
+                           'channel TEXT NOT NULL, '
+                           'subject TEXT NOT NULL, '
+                           'content TEXT NOT NULL, '
+                           'status TEXT NOT NULL, '
+                           'attempts INTEGER NOT NULL DEFAULT 0, '
+                           'last_error TEXT, '
+                           'next_attempt_at REAL NOT NULL, '
+                           'updated_at REAL NOT NULL, '
+                           "delivered TEXT NOT NULL DEFAULT '')")
+        columns = {
+            row[1]
+            for row in self._conn.execute('PRAGMA table_info(outbox)')
+        }
+        if 'delivered' not in columns:
+            self._conn.execute('ALTER TABLE outbox ADD COLUMN '
+                               "delivered TEXT NOT NULL DEFAULT ''")
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_status '
+                           'ON outbox (status, next_attempt_at)')
+        self._conn.execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND updated_at < ?",
+            (time.time() - _SENT_RETENTION, ))
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(channel: str, subject: str, content: str) -> str:
+        payload = f"{channel}\n{subject}\n{content}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def enqueue(self, channel: str, subject: str, content: str) -> str:
+        """写入待发送消息, 已存在时保持原状态, 返回幂等键"""
+
+        key = self.make_key(channel, subject, content)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO outbox (key, channel, subject, content, '
+                "status, next_attempt_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                (key, channel, subject, content, now, now))
+            self._conn.commit()
+
+        return key
+
+    def rearm(self, key: str):
+        """失败或已放弃的消息重新置为待发送并立即到期, 已送达的收件人保持不变"""
+
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, "
+                'next_attempt_at = ?, updated_at = ? '
+                "WHERE key = ? AND status IN ('failed', 'dead')",
+                (now, now, key))
+            self._conn.commit()
+
+    def claim(self,
+              key: str) -> Optional[Tuple[str, str, str, FrozenSet[str]]]:
+        """领取一条到期的消息并标记为发送中, 返回 (渠道, 标题, 内容, 已送达的收件人)
+
+        已发送、未到重试时间或正由其他任务发送的消息返回 None
+        """
+
+        now = time.time()
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = 'sending', updated_at = ? "
+                'WHERE key = ? AND ('
+                "(status IN ('pending', 'failed') AND next_attempt_at <= ?) "
+                "OR (status = 'sending' AND updated_at < ?))",
+                (now, key, now, now - Config.DELIVERY.lease_seconds))
+            self._conn.commit()
+
+            if cursor.rowcount == 0:
+                return None
+
+            channel, subject, content, delivered = self._conn.execute(
+                'SELECT channel, subject, content, delivered FROM outbox '
+                'WHERE key = ?', (key, )).fetchone()
+
+        return (channel, subject, content,
+                frozenset(filter(None, delivered.split('\n'))))
+
+    def mark_delivered(self, key: str, recipients: FrozenSet[str]):
+        """记录已送达的收件人, 重试时不再发送给他们"""
+
+        with self._lock:
+            self._conn.execute('UPDATE outbox SET delivered = ? WHERE key = ?',
+                               ('\n'.join(sorted(recipients)), key))
+            self._conn.commit()
+
+    def due(self) -> List[str]:
+        """可以重试的消息"""
+
+        now = time.time()
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key FROM outbox WHERE '
+                "(status IN ('pending', 'failed') AND next_attempt_at <= ?) "
+                "OR (status = 'sending' AND updated_at < ?) "
+                'ORDER BY next_attempt_at',
+                (now, now - Config.DELIVERY.lease_seconds))
+            return [row[0] for row in rows]
+
+    def status(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT status FROM outbox WHERE key = ?',
+                                     (key, )).fetchone()
+        return row[0] if row else None
+
+    def mark_sent(self, key: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'sent', last_error = NULL, "
+                'attempts = attempts + 1, updated_at = ? WHERE key = ?',
+                (time.time(), key))
+            self._conn.commit()
+
+    def mark_failed(self, key: str, error: str):
+        """记录失败, 按尝试次数指数退避; 超过最大次数后不再重试"""
+
+        now = time.time()
+
+        with self._lock:
+            attempts = self._conn.execute(
+                'SELECT attempts FROM outbox WHERE key = ?',
+                (key, )).fetchone()[0] + 1
+            status = ('failed'
+                      if attempts < Config.DELIVERY.max_attempts else 'dead')
+            self._conn.execute(
+                'UPDATE outbox SET status = ?, attempts = ?, last_error = ?, '
+                'next_attempt_at = ?, updated_at = ? WHERE key = ?',
+                (status, attempts, error, now +
+                 Config.DELIVERY.retry_interval * 2**(attempts - 1), now, key))
+            self._conn.commit()
+
+        if status == 'dead':
+            logger.error(f"消息 {key[:12]} 已失败 {attempts} 次, 不再重试: {error}")
+
+
+class DeliveryService:
+    """多渠道推送: 先写入 outbox, 再并发发送到各渠道, 失败的由 retry_pending 重试"""
+
+    def __init__(self, channels: Dict[str, Sender], outbox: Outbox):
+        self.channels = channels
+        self.outbox = outbox
+
+    def deliver(self,
+                subject: str,
+                content: str,
+                channels: Optional[List[str]] = None,
+                force: bool = False) -> Dict[str, bool]:
+        """推送到全部渠道 (或指定渠道), 返回各渠道结果; 之前已成功发送过的渠道直接视为成功
+
+        多收件人的渠道只要有收件人收到即视为成功, 失败的收件人留在 outbox 中重试;
+        force 时之前失败 (含已放弃) 的消息不等退避时间, 立即重发
+        """
+
+        keys = {
+            channel: self.outbox.enqueue(channel, subject, content)
+            for channel in self.channels
+            if channels is None or channel in channels
+        }
+        if not keys:
+            return {}
+
+        if force:
+            for key in keys.values():
+                self.outbox.rearm(key)
+
+        # 每个渠道一个线程, 慢渠道不影响其他渠道
+        with ThreadPoolExecutor(max_workers=max(len(keys), 1),
+                                thread_name_prefix='deliver') as executor:
+            results = dict(zip(keys, executor.map(self._send, keys.values())))
+
+        logger.info("推送结果: " + ', '.join(
+            f"{channel} {'成功' if ok else '失败'}"
+            for channel, ok in results.items()))
+
+        return results
+
+    def retry_pending(self) -> int:
+        """重试到期的失败消息以及中断时未完成的消息, 返回成功条数"""
+
+        keys = self.outbox.due()
+        if not keys:
+            return 0
+
+        logger.info(f"重试待推送消息 {len(keys)} 条")
+
+        with ThreadPoolExecutor(max_workers=min(len(keys), 4),
+                                thread_name_prefix='redeliver') as executor:
+            sent = sum(executor.map(self._send, keys))
+
+        logger.info(f"重试完成: 成功 {sent}/{len(keys)}")
+        return sent
+
+    def _send(self, key: str) -> bool:
+        message = self.outbox.claim(key)
+        if message is None:
+            # 重跑时已发送过, 或正由其他任务发送
+            return self.outbox.status(key) == 'sent'
+
+        channel, subject, content, delivered = message
+        sender = self.channels.get(channel)
+        if sender is None:
+            self.outbox.mark_failed(key, '渠道未配置')
+            return False
+
+        error = '发送失败'
+        try:
+            with metrics.timer(f'delivery.{channel}'):
+                result = sender(subject, content, key, delivered)
+        except Exception as e:
+            result, error = False, str(e)
+
+        if isinstance(result, dict):
+            failed = sorted(r for r, ok in result.items() if not ok)
+            reached = delivered | {r for r, ok in result.items() if ok}
+            if reached != delivered:
+                self.outbox.mark_delivered(key, reached)
+            success = not failed
+            if failed:
+                error = f"{len(failed)} 个收件人发送失败: {', '.join(failed[:5])}"
+        else:
+            success, reached = result, delivered
+
+        if success:
+            metrics.incr(f'delivery.{channel}.sent')
+            self.outbox.mark_sent(key)
+        else:
+            metrics.incr(f'delivery.{channel}.failed')
+            self.outbox.mark_failed(key, error)
+
+        return success or bool(reached)
@@ -1,85 +1,239 @@
+import json
 import logging
+import re
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from config import Config
+from metrics import metrics
+from markdown_renderer import to_html_document, to_text
+from resilience import TokenBucket
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class Subscriber:
+    email: str
+    categories: Optional[FrozenSet[str]] = None  # None 表示全部分类
+
+
+def load_subscribers() -> List[Subscriber]:
+    """读取订阅者列表, 未配置时使用 EMAIL_RECEIVER"""
+
+    if not Config.EMAIL.subscribers_path:
+        return [
+            Subscriber(address.strip())
+            for address in Config.EMAIL.receiver.split(',') if address.strip()
+        ]
+
+    with open(Config.EMAIL.subscribers_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    return [
+        Subscriber(
+            entry['email'].strip(),
+            frozenset(entry['categories']) if entry.get('categories') else None)
+        for entry in entries if entry.get('email')
+    ]
+
+
+def filter_sections(content: str,
+                    categories: Optional[FrozenSet[str]]) -> Optional[str]:
+    """只保留订阅分类的二级标题段落, 没有任何订阅分类时返回 None"""
+
+    if categories is None:
+        return content
+
+    header, *sections = re.split(r'(?m)^(?=## )', content)
+    kept = [
+        section for section in sections
+        if section[3:].split('\n', 1)[0].strip() in categories
+    ]
+
+    return header + ''.join(kept) if kept else None
+
+
+class SmtpSession:
+    """复用的已登录 SMTP 连接, 发送一定数量后或连接出错时重新连接"""
+
+    def __init__(self):
+        self._server = None
+        self._sent = 0
+
+    def send(self, recipient: str, payload: bytes):
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+
+            try:
+                self._server.sendmail(Config.EMAIL.sender, [recipient], payload)
+            except smtplib.SMTPRecipientsRefused:
+                raise
+            except (smtplib.SMTPException, OSError):
+                # 连接可能已被服务端断开, 重连后再试一次
+                self.close()
+                if attempt:
+                    raise
+                continue
+
+            self._sent += 1
+            if self._sent >= Config.EMAIL.messages_per_connection:
+                self.close()
+            return
+
+    def _connect(self):
+        smtp_class = smtplib.SMTP_SSL if Config.EMAIL.use_ssl else smtplib.SMTP
+
+        with metrics.timer('email.connect'):
+            server = smtp_class(Config.EMAIL.smtp_server,
+                                Config.EMAIL.smtp_port,
+                                timeout=30)
+            try:
+                server.login(Config.EMAIL.sender, Config.EMAIL.password)
+            except Exception:
+                server.close()
+                raise
+
+        metrics.incr('email.connections')
+        self._server = server
+        self._sent = 0
+
+    def close(self):
+        if self._server is None:
+            return
+
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+
 class EmailPusher:
     """邮件推送"""
 
     def __init__(self):
         if not all([
                 Config.EMAIL.sender, Config.EMAIL.password,
-                Config.EMAIL.receiver
+                Config.EMAIL.receiver or Config.EMAIL.subscribers_path
         ]):
             raise ValueError("邮件配置不完整")
 
-        logger.info(f"邮件配置: {Config.EMAIL.sender} -> {Config.EMAIL.receiver}")
+        self.subscribers = load_subscribers()
+        self.throttle = TokenBucket(Config.EMAIL.rate_limit,
+                                    Config.EMAIL.pool_size)
+
+        logger.info(f"邮件配置: {Config.EMAIL.sender} -> "
+                    f"{len(self.subscribers)} 个收件人")
+
+    def send(self,
+             content: str,
+             subject: str = None,
+             message_id: Optional[str] = None) -> bool:
+        """发送邮件给全部订阅者, 至少一人发送成功即返回 True"""
 
-    def send(self, content: str, subject: str = None) -> bool:
-        """发送邮件"""
+        return any(self.send_bulk(content, subject, message_id).values())
+
+    def send_bulk(self,
+                  content: str,
+                  subject: str = None,
+                  message_id: Optional[str] = None,
+                  skip: FrozenSet[str] = frozenset()) -> Dict[str, bool]:
+        """按订阅分类发送, 返回每个收件人的发送结果 (没有订阅内容的收件人不在结果中)
+
+        传入 message_id 时写入 Message-ID 头, 重发的邮件可被邮件客户端识别为同一封;
+        skip 中的收件人 (之前已送达) 不再发送
+        """
 
         if not content:
             logger.warning("邮件内容为空")
-            return False
+            return {}
 
         subject = subject or f"每日新闻简报 - {datetime.now():%Y-%m-%d}"
 
-        try:
-            message = self._create_message(subject, content)
-            self._send_via_smtp(message)
+        # 分类偏好相同的订阅者共用一份渲染结果
+        payloads = {}
+        jobs = []
+        for subscriber in self.subscribers:
+            if subscriber.email in skip:
+                continue
 
-            logger.info(f"邮件发送成功: {Config.EMAIL.receiver}")
-            return True
+            if subscriber.categories not in payloads:
+                body = filter_sections(content, subscriber.categories)
+                payloads[subscriber.categories] = (
+                    self._render(subject, body, message_id) if body else None)
 
-        except smtplib.SMTPAuthenticationError as e:
-            logger.error(f"认证失败: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"邮件发送失败: {e}")
-            return False
+            payload = payloads[subscriber.categories]
+            if payload is None:
+                logger.info(f"{subscriber.email} 订阅的分类本次没有内容, 跳过")
+                continue
 
-    def _create_message(self, subject: str, content: str) -> MIMEMultipart:
-        """创建邮件消息"""
+            jobs.append((subscriber.email, payload))
 
-        message = MIMEMultipart('alternative')
-        message['From'] = Config.EMAIL.sender
-        message['To'] = Config.EMAIL.receiver
-        message['Subject'] = subject
+        if not jobs:
+            return {}
 
-        html_content = self._markdown_to_html(content)
+        workers = max(1, min(Config.EMAIL.pool_size, len(jobs)))
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix='smtp') as executor:
+            for chunk in executor.map(self._send_chunk,
+                                      [jobs[i::workers] for i in range(workers)]):
+                results.update(chunk)
 
-        message.attach(MIMEText(content, 'plain', 'utf-8'))
-        message.attach(MIMEText(html_content, 'html', 'utf-8'))
+        sent = sum(results.values())
+        metrics.incr('email.sent', sent)
+        logger.info(f"邮件发送完成: 成功 {sent}/{len(results)}")
 
-        return message
+        return results
 
-    def _send_via_smtp(self, message: MIMEMultipart):
-        """通过 SMTP 发送邮件"""
+    def _send_chunk(self, jobs: List[Tuple[str, bytes]]) -> Dict[str, bool]:
+        """在一个复用的连接上依次发送"""
 
-        with smtplib.SMTP_SSL(Config.EMAIL.smtp_server,
-                              Config.EMAIL.smtp_port,
-                              timeout=30) as server:
-            server.login(Config.EMAIL.sender, Config.EMAIL.password)
-            server.send_message(message)
+        session = SmtpSession()
+        results = {}
 
-    def _markdown_to_html(self, markdown_text: str) -> str:
-        """Markdown 转 HTML"""
-
-        html = markdown_text
+        try:
+            for idx, (recipient, payload) in enumerate(jobs):
+                self.throttle.acquire()
+
+                try:
+                    with metrics.timer('email.send_via_smtp'):
+                        session.send(
+                            recipient,
+                            f"To: {recipient}\r\n".encode('utf-8') + payload)
+                    results[recipient] = True
+
+                except smtplib.SMTPAuthenticationError as e:
+                    metrics.incr('email.errors')
+                    logger.error(f"认证失败: {e}")
+                    results.update({r: False for r, _ in jobs[idx:]})
+                    break
+                except Exception as e:
+                    metrics.incr('email.errors')
+                    logger.error(f"邮件发送失败 [{recipient}]: {e}")
+                    results[recipient] = False
+        finally:
+            session.close()
+
+        return results
+
+    def _render(self, subject: str, content: str,
+                message_id: Optional[str]) -> bytes:
+        """渲染邮件 (不含收件人), 发送时再拼上 To 头"""
 
-        import re
-        html = re.sub(r'^### (.+)$', r'<h3>\1</h3>', html, flags=re.MULTILINE)
-        html = re.sub(r'^## (.+)$', r'<h2>\1</h2>', html, flags=re.MULTILINE)
-        html = re.sub(r'^# (.+)$', r'<h1>\1</h1>', html, flags=re.MULTILINE)
-        html = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html)
-        html = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', html)
+        message = MIMEMultipart('alternative')
+        message['From'] = Config.EMAIL.sender
+        message['Subject'] = subject
+        if message_id:
+            message['Message-ID'] = message_id
 
-        html = html.replace('\n\n', '</p><p>')
-        html = f'<html><body style="font-family: Arial, sans-serif; line-height: 1.6; padding: 20px;"><p>{html}</p></body></html>'
+        message.attach(MIMEText(to_text(content), 'plain', 'utf-8'))
+        message.attach(MIMEText(to_html_document(content), 'html', 'utf-8'))
 
-        return html
+        return message.as_bytes(policy=message.policy.clone(linesep='\r\n'))
@@ -1,78 +1,670 @@
+import argparse
 import logging
 import sys
+import time
 from datetime import datetime
-from typing import List, Dict
+from functools import cached_property
+from typing import List, Optional
 
-from config import Config
-from tavily_searcher import TavilySearcher
-from ai_processor import AIProcessor
-from email_pusher import EmailPusher
+_STARTED_AT = time.monotonic()
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f'news_{datetime.now():%Y%m%d}.log'),
-        logging.StreamHandler(sys.stdout)
-    ])
+from config import Config, load_env
+from metrics import metrics
+from news_item import NewsItem
+from run_artifacts import RunArtifacts, read_items, write_items
+from watermark_store import item_id
 
 logger = logging.getLogger(__name__)
 
 
+def setup_logging(stream=sys.stdout, log_file: bool = True):
+    """日志输出到控制台, log_file 时同时写入按日期命名的文件 (首次写日志时才创建)"""
+
+    handlers = [logging.StreamHandler(stream)]
+    if log_file:
+        handlers.insert(
+            0,
+            logging.FileHandler(f'news_{datetime.now():%Y%m%d}.log',
+                                delay=True))
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=handlers)
+
+
+def brief_subject() -> str:
+    return f"今日全球新闻速览 ({datetime.now():%Y-%m-%d})"
+
+
 class NewsAggregator:
-    """新闻聚合器"""
+    """新闻聚合器
+
+    各组件在首次使用时才创建, 只跑部分阶段时不导入用不到的服务 SDK
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        # 进程启动时间, 首次运行时记录启动耗时
+        self.started_at = started_at
+
+        # 本次搜索的查询与开始时间, 推送成功后用于推进增量水位
+        self._searched_queries = {}
+        self._searched_at = time.time()
+
+        # 本次的查询计划和各查询返回条数, 生成简报后记录查询产出
+        self._search_plan = None
+        self._returned = {}
+
+        # 本次运行的各阶段产物, 只在 run 中记录
+        self.artifacts: Optional[RunArtifacts] = None
+
+        # 恢复运行时之前失败的推送立即重发, 不等 outbox 的退避时间
+        self._force_delivery = False
+
+    @cached_property
+    def searcher(self):
+        from tavily_searcher import TavilySearcher
+        return TavilySearcher()
+
+    @cached_property
+    def ai_processor(self):
+        from ai_processor import AIProcessor
+        return AIProcessor()
+
+    @cached_property
+    def email_pusher(self):
+        from email_pusher import EmailPusher
+        return EmailPusher()
+
+    @cached_property
+    def deduplicator(self):
+        if not Config.DEDUP.enabled:
+            return None
+        from deduplicator import NewsDeduplicator
+        return NewsDeduplicator()
+
+    @cached_property
+    def pushplus(self):
+        if not Config.PUSHPLUS.token:
+            return None
+        from pushplus_notifier import PushPlusNotifier
+        return PushPlusNotifier()
+
+    @cached_property
+    def delivery(self):
+        from delivery import DeliveryService, Outbox
+        return DeliveryService(
+            self._channels(), Outbox(Config.DELIVERY.outbox_path or ':memory:'))
 
-    def __init__(self):
-        self.searcher = TavilySearcher()
-        self.ai_processor = AIProcessor()
-        self.email_pusher = EmailPusher()
+    @cached_property
+    def fetcher(self):
+        if not Config.PIPELINE.fetch_enabled:
+            return None
+        from content_fetcher import ContentFetcher
+        return ContentFetcher()
 
-    def collect_news(self) -> List[Dict]:
+    @cached_property
+    def watermarks(self):
+        if not Config.INCREMENTAL.enabled:
+            return None
+        from watermark_store import WatermarkStore
+        return WatermarkStore(Config.INCREMENTAL.path)
+
+    @cached_property
+    def planner(self):
+        if not Config.PLANNER.stats_path:
+            return None
+        from query_planner import QueryPlanner
+        return QueryPlanner(Config.PLANNER.stats_path)
+
+    @cached_property
+    def quality_filter(self):
+        if not Config.QUALITY.enabled:
+            return None
+        from quality_filter import QualityFilter
+        return QualityFilter()
+
+    def _channels(self) -> dict:
+        """已配置的推送渠道"""
+
+        from webhook_notifier import WebhookNotifier
+
+        # 在这里创建好各渠道, 避免重试线程并发地初始化
+        email_pusher, pushplus = self.email_pusher, self.pushplus
+
+        channels = {
+            'email':
+            lambda subject, content, key, delivered: email_pusher.send_bulk(
+                content, subject, f"<{key[:32]}@news-push>", skip=delivered)
+        }
+
+        if pushplus:
+            channels['pushplus'] = (lambda subject, content, key, delivered:
+                                    pushplus.send(subject, content))
+
+        for url in Config.DELIVERY.webhook_urls.split(','):
+            if url.strip():
+                webhook = WebhookNotifier(url.strip())
+                channels[webhook.name] = (
+                    lambda subject, content, key, delivered, webhook=webhook:
+                    webhook.send(subject, content, key))
+
+        return channels
+
+    def collect_news(self,
+                     categories: Optional[List[str]] = None) -> List[NewsItem]:
         """收集新闻"""
         logger.info("开始使用 Tavily 搜索新闻")
 
-        all_news = self.searcher.search_all_categories()
+        self._start_search(categories)
+
+        all_news = self.searcher.search_all_categories(categories,
+                                                       self._search_plan)
+        self._returned = dict(self.searcher.returned)
         logger.info(f"共收集到 {len(all_news)} 条新闻")
 
+        if self.artifacts:
+            self.artifacts.save_items('search', all_news)
+
+        return self.filter_news(all_news)
+
+    def filter_news(self, all_news: List[NewsItem]) -> List[NewsItem]:
+        """增量、去重、补全原文和质量过滤"""
+
+        if self.watermarks:
+            all_news = self.watermarks.filter_new(all_news)
+
+        if self.deduplicator:
+            all_news = self.deduplicator.deduplicate(all_news)
+
+        if self.fetcher:
+            all_news = self._enrich(all_news)
+
+        # 补全原文之后再过滤, 按抓取到的正文判断质量
+        if self.quality_filter:
+            all_news = self.quality_filter.filter(all_news)
+
+        if self.artifacts:
+            self.artifacts.save_items('filtered', all_news)
+
         return all_news
 
-    def process_and_send(self, news_items: List[Dict]):
+    def _start_search(self, categories: Optional[List[str]]):
+        search_queries = Config.get_search_queries(categories)
+        self._search_plan = None
+
+        if self.planner:
+            self._search_plan = self.planner.plan(search_queries)
+            # 只有实际执行的查询推进水位
+            search_queries = {}
+            for planned in self._search_plan:
+                search_queries.setdefault(planned.category,
+                                          []).append(planned.query)
+
+        self._searched_queries = search_queries
+        self._searched_at = time.time()
+        self.searcher.returned.clear()
+
+        if self.artifacts:
+            self.artifacts.annotate(queries=self._searched_queries,
+                                    searched_at=self._searched_at)
+
+    def _enrich(self, news_items: List[NewsItem]) -> List[NewsItem]:
+        """为内容过短的新闻抓取原文"""
+
+        thin = [
+            item.url for item in news_items if item.url and
+            len(item.content) < Config.PIPELINE.fetch_min_chars
+        ]
+        if not thin:
+            return news_items
+
+        contents = self.fetcher.fetch_many(thin)
+
+        enriched = []
+        for item in news_items:
+            text = contents.get(item.url)
+            if text and len(text) > len(item.content):
+                item = item.with_content(text)
+            enriched.append(item)
+
+        return enriched
+
+    def process_and_send(self, news_items: List[NewsItem]):
         """AI 处理并推送"""
         if not news_items:
             logger.warning("没有新新闻需要发送")
             return
 
+        subject = brief_subject()
+
         logger.info("使用 OpenAI 分析新闻")
-        summary = self.ai_processor.analyze_and_summarize(news_items)
+        if Config.OPENAI.stream:
+            summary = self._stream_summary(news_items, subject)
+        else:
+            summary = self.ai_processor.analyze_and_summarize(news_items)
 
-        subject = f"今日全球新闻速览 ({datetime.now():%Y-%m-%d})"
-        logger.info("发送邮件")
+        if summary is None:
+            self._deliver_fallback(news_items, subject)
+            return
 
-        success = self.email_pusher.send(summary, subject)
+        # 已按分类逐条推送到 PushPlus 时, 完整简报不再推送到 PushPlus
+        channels = None
+        if Config.OPENAI.stream and self.pushplus and Config.PUSHPLUS.per_section:
+            channels = [c for c in self.delivery.channels if c != 'pushplus']
 
-        if success:
-            logger.info("新闻推送成功")
-        else:
+        self._record_yield(news_items, summary)
+        self._deliver(summary,
+                      news_items,
+                      subject,
+                      channels=channels,
+                      pushed=self.ai_processor.packed_items(news_items))
+
+    def _record_yield(self, news_items: List[NewsItem], summary: str):
+        """记录本次执行的查询的产出, 供下次规划查询"""
+
+        if self.planner and self._returned:
+            self.planner.record(self._returned, news_items, summary)
+        self._returned = {}
+
+    def _deliver_fallback(self, news_items: List[NewsItem], subject: str):
+        """简报生成失败时推送最近一次成功生成的简报, 没有可用的则不推送"""
+
+        metrics.incr('run.summary_failed')
+
+        brief = self.ai_processor.last_brief.load(
+            Config.OPENAI.fallback_max_age,
+            (item.category for item in news_items))
+        if brief is None:
+            logger.error("简报生成失败, 且没有同一组分类的可用历史简报, 本次不推送")
+            return
+
+        metrics.incr('run.fallback_brief')
+        logger.warning("简报生成失败, 改为推送最近一次成功生成的简报")
+
+        # 本次新闻并未推送, 不记录去重和水位, 下次运行仍会处理
+        self._deliver(brief, news_items, subject, record=False)
+
+    def _deliver(self,
+                 summary: str,
+                 news_items: List[NewsItem],
+                 subject: str,
+                 record: bool = True,
+                 channels: Optional[List[str]] = None,
+                 pushed: Optional[List[NewsItem]] = None):
+        """发送简报并记录已推送新闻, 不指定 channels 时推送到全部渠道
+
+        news_items 为本次过滤后的新闻, pushed 为其中实际写入简报的部分 (默认全部);
+        未写入简报的新闻不记录去重, 也不推进其所在查询的水位, 下次运行仍会处理
+        """
+
+        if pushed is None:
+            pushed = news_items
+
+        if self.artifacts and record:
+            self.artifacts.save_items('pushed', pushed)
+            self.artifacts.save_brief(subject, summary)
+
+        logger.info(
+            f"推送简报: {', '.join(channels or self.delivery.channels)}")
+
+        with metrics.timer('delivery.send'):
+            results = self.delivery.deliver(subject, summary, channels,
+                                            self._force_delivery)
+
+        # 失败的渠道留在 outbox 中由重试任务补发, 至少一个渠道成功即视为已推送
+        success = any(results.values())
+
+        if self.artifacts:
+            self.artifacts.complete('delivery', success=success, results=results)
+        if not success:
             logger.error("新闻推送失败")
+            return
+
+        logger.info("新闻推送成功")
+
+        if not record:
+            return
+
+        if self.deduplicator:
+            self.deduplicator.mark_pushed(pushed)
+        if self.watermarks:
+            packed = {id(item) for item in pushed}
+            self.watermarks.commit(
+                self._searched_queries, pushed, self._searched_at,
+                [item for item in news_items if id(item) not in packed])
+
+    def _stream_summary(self, news_items: List[NewsItem],
+                        subject: str) -> Optional[str]:
+        """流式生成简报, 每完成一个分类即推送到 PushPlus, 全部失败时返回 None"""
+
+        sections = {}
+        failed = []
+
+        for category, section in self.ai_processor.stream_summarize(
+                news_items):
+            if section is None:
+                failed.append(category)
+                continue
+
+            sections[category] = section
+
+            if self.pushplus and Config.PUSHPLUS.per_section:
+                # 经 outbox 推送, 失败的分类由重试任务补发
+                self.delivery.deliver(f"[{category}] {subject}",
+                                      f"## {category}\n\n{section}",
+                                      ['pushplus'], self._force_delivery)
+
+        if not sections:
+            return "暂无新闻数据" if not failed else None
+
+        # 按原始分类顺序拼装
+        order = list(dict.fromkeys(item.category for item in news_items))
+        ordered = {
+            category: sections[category]
+            for category in order if category in sections
+        }
+
+        summary = self.ai_processor.assemble(ordered, failed)
+        self.ai_processor.last_brief.save(
+            summary, (item.category for item in news_items))
+        return summary
+
+    def run_pipeline(self, categories: Optional[List[str]] = None):
+        """异步流水线模式: 搜索、补全、过滤、摘要重叠执行"""
+
+        self._start_search(categories)
+
+        from pipeline import AsyncPipeline
+
+        self.ai_processor.reset_prompt_budget()
+        pipeline = AsyncPipeline(self.searcher, self.ai_processor,
+                                 self.fetcher, self.deduplicator,
+                                 self.watermarks, self.quality_filter)
+        news_items, sections, failed = pipeline.run(categories,
+                                                    self._search_plan)
+        self._returned = dict(self.searcher.returned)
+
+        if self.artifacts:
+            self.artifacts.save_items('filtered', news_items)
+
+        subject = brief_subject()
+
+        if not sections:
+            if failed:
+                logger.error(f"所有分类摘要生成失败: {', '.join(failed)}")
+                self._deliver_fallback(news_items, subject)
+            else:
+                logger.warning("没有新新闻需要发送")
+            return
+
+        summary = self.ai_processor.assemble(sections, failed)
+        self.ai_processor.last_brief.save(
+            summary, (item.category for item in news_items))
+        self._record_yield(news_items, summary)
+        self._deliver(summary,
+                      news_items,
+                      subject,
+                      pushed=[
+                          item for item in
+                          self.ai_processor.packed_items(news_items)
+                          if item.category in sections
+                      ])
+
+    @staticmethod
+    def _create_artifacts(
+            categories: Optional[List[str]]) -> Optional[RunArtifacts]:
+        if not Config.ARTIFACTS.path:
+            return None
+
+        try:
+            RunArtifacts.prune(Config.ARTIFACTS.path,
+                               Config.ARTIFACTS.retention_days)
+        except OSError as e:
+            logger.warning(f"清理运行产物失败: {e}")
+
+        artifacts = RunArtifacts.create(Config.ARTIFACTS.path, categories)
+        logger.info(f"运行 ID: {artifacts.run_id}")
+        return artifacts
+
+    def resume(self):
+        """从最后完成的阶段继续: 已有简报直接推送, 已有新闻只重新生成简报"""
+
+        artifacts = self.artifacts
+        logger.info(f"恢复运行 {artifacts.run_id}, "
+                    f"最后完成的阶段: {artifacts.last_stage() or '无'}")
+
+        self._searched_queries = artifacts.manifest.get('queries', {})
+        self._searched_at = artifacts.manifest.get('searched_at', time.time())
+
+        if artifacts.stage('brief'):
+            brief = artifacts.load_brief()
+            news_items = artifacts.load_items('filtered')
+            pushed = news_items
+            if artifacts.stage('pushed'):
+                ids = {
+                    item_id(item) for item in artifacts.load_items('pushed')
+                }
+                pushed = [item for item in news_items if item_id(item) in ids]
+            self._deliver(brief['summary'],
+                          news_items,
+                          brief['subject'],
+                          pushed=pushed)
+        elif artifacts.stage('filtered'):
+            self.process_and_send(artifacts.load_items('filtered'))
+        elif artifacts.stage('search'):
+            self.process_and_send(
+                self.filter_news(artifacts.load_items('search')))
+        else:
+            self.process_and_send(self.collect_news(artifacts.categories))
+
+    def run(self,
+            categories: Optional[List[str]] = None,
+            resume_from: Optional[RunArtifacts] = None):
+        """执行完整流程, 可只处理部分分类; 指定 resume_from 时从该次运行的产物继续"""
+
+        if resume_from is not None:
+            categories = resume_from.categories
 
-    def run(self):
-        """执行完整流程"""
         logger.info("=" * 80)
-        logger.info("新闻聚合任务启动")
+        logger.info("新闻聚合任务启动" +
+                    (f": {', '.join(categories)}" if categories else ""))
         logger.info("=" * 80)
 
+        metrics.reset()
+        start = time.monotonic()
+
+        if self.started_at is not None:
+            metrics.observe('startup', start - self.started_at)
+            self.started_at = None
+
         try:
-            news_items = self.collect_news()
-            self.process_and_send(news_items)
+            # 先补发之前失败或中断的消息
+            self.delivery.retry_pending()
+
+            if resume_from is not None:
+                self.artifacts = resume_from
+                self._force_delivery = True
+                self.resume()
+            else:
+                self.artifacts = self._create_artifacts(categories)
+
+                if Config.PIPELINE.mode == 'async':
+                    self.run_pipeline(categories)
+                else:
+                    news_items = self.collect_news(categories)
+                    self.process_and_send(news_items)
 
         except Exception as e:
+            metrics.incr('run.errors')
             logger.error(f"任务执行失败: {e}", exc_info=True)
 
+        self.artifacts = None
+        self._force_delivery = False
+        metrics.observe('run.total', time.monotonic() - start)
+        try:
+            metrics.write(Config.METRICS.report_dir,
+                          Config.METRICS.prometheus_path)
+        except OSError as e:
+            logger.warning(f"运行报告写入失败: {e}")
+
         logger.info("=" * 80)
         logger.info("任务完成")
         logger.info("=" * 80)
 
 
+def schedule_problems() -> List[str]:
+    """检查定时计划的 cron 表达式"""
+
+    from apscheduler.triggers.cron import CronTrigger
+    from scheduler import parse_schedules
+
+    problems = []
+    for expression, _ in parse_schedules():
+        try:
+            CronTrigger.from_crontab(expression,
+                                     timezone=Config.SCHEDULE.timezone)
+        except ValueError as e:
+            problems.append(f"SCHEDULES 中的 cron 表达式无效 [{expression}]: {e}")
+    return problems
+
+
+def parse_categories(value: str) -> Optional[List[str]]:
+    return [c.strip() for c in value.split(',') if c.strip()] or None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="新闻聚合推送")
+    parser.add_argument('--env-file', help='.env 文件路径, 默认为当前目录下的 .env')
+    parser.add_argument('--daemon',
+                        action='store_true',
+                        help='常驻运行, 按 SCHEDULES 定时推送 (同 run --daemon)')
+
+    commands = parser.add_subparsers(dest='command')
+
+    run = commands.add_parser('run', help='完整流程: 搜索、摘要、推送 (默认)')
+    run.add_argument('--daemon',
+                     action='store_true',
+                     default=argparse.SUPPRESS,
+                     help='常驻运行, 按 SCHEDULES 定时推送')
+    run.add_argument('--categories',
+                     type=parse_categories,
+                     help='只处理这些分类, 逗号分隔')
+    run.add_argument('--resume',
+                     nargs='?',
+                     const='',
+                     metavar='RUN_ID',
+                     help='从该次运行最后完成的阶段继续, 不指定时为最近一次运行')
+
+    commands.add_parser('validate', help='只检查配置, 不调用外部服务')
+
+    search = commands.add_parser('search-only',
+                                 help='只搜索和过滤, 把新闻写成 JSON Lines')
+    search.add_argument('--categories',
+                        type=parse_categories,
+                        help='只处理这些分类, 逗号分隔')
+    search.add_argument('-o',
+                        '--output',
+                        default='-',
+                        help='输出文件, 默认为标准输出')
+
+    summarize = commands.add_parser('summarize-from-file',
+                                    help='读取 search-only 的输出生成简报')
+    summarize.add_argument('input',
+                           help='新闻文件 (JSON Lines, 可为 .gz), "-" 为标准输入')
+    summarize.add_argument('--send',
+                           action='store_true',
+                           help='推送简报, 默认只输出到标准输出')
+
+    return parser
+
+
+# 各命令用到的阶段, 只检查这些阶段的配置
+_COMMAND_STAGES = {
+    'run': ('search', 'summarize', 'deliver'),
+    'validate': ('search', 'summarize', 'deliver'),
+    'search-only': ('search', ),
+    'summarize-from-file': ('summarize', )
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    command = args.command or 'run'
+    categories = getattr(args, 'categories', None)
+    daemon = command == 'run' and args.daemon
+
+    # 结果写到标准输出时, 日志改走标准错误; 只有 run 写日志文件
+    to_stdout = (command == 'validate'
+                 or command == 'search-only' and args.output == '-'
+                 or command == 'summarize-from-file' and not args.send)
+    setup_logging(sys.stderr if to_stdout else sys.stdout,
+                  log_file=command == 'run')
+
+    load_env(args.env_file)
+
+    stages = _COMMAND_STAGES[command]
+    if command == 'summarize-from-file' and args.send:
+        stages += ('deliver', )
+
+    problems = Config.validate(stages)
+    if not problems and (daemon or command == 'validate'):
+        problems = schedule_problems()
+
+    if problems:
+        for problem in problems:
+            logger.error(f"配置错误: {problem}")
+        return 2
+
+    if command == 'validate':
+        logger.info("配置检查通过")
+        return 0
+
+    resume_from = None
+    if getattr(args, 'resume', None) is not None:
+        if Config.ARTIFACTS.path:
+            resume_from = RunArtifacts.load(Config.ARTIFACTS.path, args.resume
+                                            or None)
+        if resume_from is None:
+            logger.error("没有可恢复的运行")
+            return 1
+        if resume_from.finished:
+            logger.info(f"运行 {resume_from.run_id} 已推送成功, 无需恢复")
+            return 0
+
+    logger.info(f"启动完成, 耗时 {time.monotonic() - _STARTED_AT:.3f}s")
+    aggregator = NewsAggregator(started_at=_STARTED_AT)
+
+    if command == 'search-only':
+        news_items = aggregator.collect_news(categories)
+        write_items(news_items, args.output)
+        logger.info(f"已输出 {len(news_items)} 条新闻")
+        return 0
+
+    if command == 'summarize-from-file':
+        news_items = read_items(args.input)
+        summary = aggregator.ai_processor.analyze_and_summarize(news_items)
+        if summary is None:
+            logger.error("简报生成失败")
+            return 1
+
+        if args.send:
+            aggregator._deliver(
+                summary,
+                news_items,
+                brief_subject(),
+                pushed=aggregator.ai_processor.packed_items(news_items))
+        else:
+            sys.stdout.write(summary + '\n')
+        return 0
+
+    if daemon:
+        from scheduler import NewsScheduler
+        NewsScheduler(aggregator).start()
+    else:
+        aggregator.run(categories, resume_from)
+    return 0
+
+
 if __name__ == "__main__":
-    aggregator = NewsAggregator()
-    aggregator.run()
+    sys.exit(main())
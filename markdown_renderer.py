@@ -0,0 +1,224 @@
+import html
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+# 行内元素: 加粗、[文字](链接)、裸链接, 一次扫描完成
+_INLINE_PATTERN = re.compile(
+    r'\*\*(?P<bold>.+?)\*\*'
+    r'|\[(?P<text>[^\]]+)\]\((?P<href>[^)\s]+)\)'
+    r'|(?P<url>https?://[^\s<>()\[\]]+[^\s<>()\[\].,;:!?，。；：！？])')
+
+# 块级元素按行首识别
+_BLOCK_PATTERN = re.compile(r'(?P<heading>#{1,6}) +(?P<title>.*)'
+                            r'|(?P<rule>[-*_]{3,})'
+                            r'|(?P<bullet>[-*+]) +(?P<item>.*)'
+                            r'|(?P<number>\d+)[.)] +(?P<entry>.*)'
+                            r'|> ?(?P<quote>.*)')
+
+# 可连续多行组成一个块的元素
+_LINE_KINDS = {'item': 'ul', 'entry': 'ol', 'quote': 'quote'}
+
+_SAFE_SCHEMES = ('http://', 'https://', 'mailto:')
+
+_STYLE = """
+body {
+    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Arial, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    max-width: 800px;
+    margin: 0 auto;
+    padding: 20px;
+}
+h1 { color: #1a1a1a; border-bottom: 2px solid #e0e0e0; padding-bottom: 10px; }
+h2 { color: #2c3e50; margin-top: 30px; }
+h3 { color: #34495e; }
+a { color: #3498db; text-decoration: none; }
+li { margin-bottom: 8px; }
+blockquote { color: #777; border-left: 4px solid #e0e0e0; margin: 0; padding-left: 12px; }
+"""
+
+# 行内片段: (类型, 文本, 链接), 类型为 text / bold / link / break (列表项内换行)
+Inline = Tuple[str, str, str]
+
+_BREAK = ('break', '', '')
+
+
+class Block(NamedTuple):
+    """块级元素, lines 中每一行是解析好的行内片段"""
+
+    kind: str  # heading / rule / ul / ol / quote / paragraph
+    level: int
+    lines: Tuple[Tuple[Inline, ...], ...]
+    numbers: Tuple[int, ...] = ()  # 有序列表各项的原始序号
+
+
+def parse_inline(text: str) -> Tuple[Inline, ...]:
+    """切分一行中的行内元素"""
+
+    tokens = []
+    position = 0
+
+    for match in _INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            tokens.append(('text', text[position:match.start()], ''))
+
+        if match.group('bold') is not None:
+            tokens.append(('bold', match.group('bold'), ''))
+        elif match.group('href') is not None:
+            tokens.append(('link', match.group('text'), match.group('href')))
+        else:
+            tokens.append(('link', match.group('url'), match.group('url')))
+
+        position = match.end()
+
+    if position < len(text):
+        tokens.append(('text', text[position:], ''))
+
+    return tuple(tokens)
+
+
+@lru_cache(maxsize=32)
+def parse(markdown_text: str) -> Tuple[Block, ...]:
+    """把简报解析为块级元素序列, 结果按文本缓存"""
+
+    blocks: List[Block] = []
+    kind = None
+    lines = []
+    numbers = []
+
+    def flush():
+        if kind is not None:
+            blocks.append(Block(kind, 0, tuple(lines), tuple(numbers)))
+
+    for raw in markdown_text.splitlines():
+        line = raw.strip()
+        if not line:
+            # 列表项之间的空行不结束列表
+            if kind not in ('ul', 'ol'):
+                flush()
+                kind, lines, numbers = None, [], []
+            continue
+
+        match = _BLOCK_PATTERN.fullmatch(line)
+        group = match.lastgroup if match else None
+
+        # 缩进的非列表行属于上一个列表项 (如条目下的摘要、链接)
+        if (kind in ('ul', 'ol') and raw[:1] in (' ', '\t')
+                and group not in ('item', 'entry')):
+            lines[-1] += (_BREAK, ) + parse_inline(line)
+            continue
+
+        if group in ('title', 'rule'):
+            flush()
+            kind, lines, numbers = None, [], []
+            if group == 'title':
+                blocks.append(
+                    Block('heading', len(match.group('heading')),
+                          (parse_inline(match.group('title')), )))
+            else:
+                blocks.append(Block('rule', 0, ()))
+            continue
+
+        if group in _LINE_KINDS:
+            line_kind, text = _LINE_KINDS[group], match.group(group)
+        else:
+            line_kind, text = 'paragraph', line
+
+        if line_kind != kind:
+            flush()
+            kind, lines, numbers = line_kind, [], []
+        lines.append(parse_inline(text))
+        if group == 'entry':
+            numbers.append(int(match.group('number')))
+
+    flush()
+    return tuple(blocks)
+
+
+def _inline_html(tokens: Tuple[Inline, ...]) -> str:
+    parts = []
+    for kind, text, href in tokens:
+        if kind == 'break':
+            parts.append('<br>')
+        elif kind == 'bold':
+            parts.append(f"<strong>{html.escape(text)}</strong>")
+        elif kind == 'link' and href.lower().startswith(_SAFE_SCHEMES):
+            parts.append(f'<a href="{html.escape(href)}">'
+                         f'{html.escape(text)}</a>')
+        else:
+            parts.append(html.escape(text))
+    return ''.join(parts)
+
+
+def _inline_text(tokens: Tuple[Inline, ...]) -> str:
+    parts = []
+    for kind, text, href in tokens:
+        if kind == 'break':
+            parts.append('\n   ')
+        elif kind == 'link' and href != text:
+            parts.append(f"{text} ({href})")
+        else:
+            parts.append(text)
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=32)
+def to_html(markdown_text: str) -> str:
+    """渲染为 HTML 片段"""
+
+    parts = []
+
+    for block in parse(markdown_text):
+        if block.kind == 'heading':
+            parts.append(f"<h{block.level}>{_inline_html(block.lines[0])}"
+                         f"</h{block.level}>")
+        elif block.kind == 'rule':
+            parts.append('<hr>')
+        elif block.kind in ('ul', 'ol'):
+            items = ''.join(f"<li>{_inline_html(line)}</li>"
+                            for line in block.lines)
+            start = (f' start="{block.numbers[0]}"'
+                     if block.numbers and block.numbers[0] != 1 else '')
+            parts.append(f"<{block.kind}{start}>{items}</{block.kind}>")
+        elif block.kind == 'quote':
+            parts.append(f"<blockquote>"
+                         f"{'<br>'.join(map(_inline_html, block.lines))}"
+                         f"</blockquote>")
+        else:
+            parts.append(
+                f"<p>{'<br>'.join(map(_inline_html, block.lines))}</p>")
+
+    return '\n'.join(parts)
+
+
+@lru_cache(maxsize=32)
+def to_html_document(markdown_text: str) -> str:
+    """渲染为完整 HTML 文档 (邮件、PushPlus 共用)"""
+
+    return (f'<html><head><meta charset="UTF-8"><style>{_STYLE}</style></head>'
+            f'<body>\n{to_html(markdown_text)}\n</body></html>')
+
+
+@lru_cache(maxsize=32)
+def to_text(markdown_text: str) -> str:
+    """渲染为纯文本: 去掉标记, 链接写在文字后面"""
+
+    parts = []
+
+    for block in parse(markdown_text):
+        if block.kind == 'ol':
+            lines = [
+                f"{number}. {_inline_text(line)}"
+                for number, line in zip(block.numbers, block.lines)
+            ]
+        elif block.kind == 'ul':
+            lines = [f"- {_inline_text(line)}" for line in block.lines]
+        elif block.kind == 'rule':
+            lines = ['-' * 20]
+        else:
+            lines = [_inline_text(line) for line in block.lines]
+
+        parts.append('\n'.join(lines))
+
+    return '\n\n'.join(parts) + '\n'
@@ -0,0 +1,149 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+from storage import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class RunMetrics:
+    """单次运行的性能指标: 阶段耗时、计数器、过滤前后数量、token 用量"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now()
+            self._timings = {}
+            self._counters = {}
+            self._filters = {}
+
+    @contextmanager
+    def timer(self, stage: str):
+        """记录一段代码的耗时"""
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start)
+
+    def timed(self, stage: str):
+        """方法耗时装饰器"""
+
+        def decorator(func):
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self._timings.setdefault(stage, []).append(seconds)
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record_filter(self, name: str, count_in: int, count_out: int):
+        """记录过滤阶段的输入 / 输出数量"""
+
+        with self._lock:
+            stats = self._filters.setdefault(name, {'in': 0, 'out': 0})
+            stats['in'] += count_in
+            stats['out'] += count_out
+
+    def record_usage(self, usage, prefix: str = 'openai'):
+        """记录 OpenAI 返回的 token 用量"""
+
+        if usage is None:
+            return
+
+        self.incr(f'{prefix}.prompt_tokens', usage.prompt_tokens or 0)
+        self.incr(f'{prefix}.completion_tokens', usage.completion_tokens or 0)
+
+    def report(self) -> Dict:
+        """生成运行报告"""
+
+        with self._lock:
+            stages = {}
+            for stage, values in self._timings.items():
+                ordered = sorted(values)
+                stages[stage] = {
+                    'count': len(ordered),
+                    'total': round(sum(ordered), 4),
+                    'max': round(ordered[-1], 4),
+                    'p50': round(ordered[len(ordered) // 2], 4),
+                    'p95': round(ordered[int(len(ordered) * 0.95)], 4)
+                }
+
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'stages': stages,
+                'counters': dict(self._counters),
+                'filters': {
+                    name: dict(stats)
+                    for name, stats in self._filters.items()
+                }
+            }
+
+    def write(self, report_dir: str,
+              prometheus_path: Optional[str] = None) -> str:
+        """写出 JSON 报告, 可选写出 Prometheus textfile"""
+
+        report = self.report()
+
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir,
+                            f"run_{self.started_at:%Y%m%d_%H%M%S}.json")
+        atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+        logger.info(f"运行报告: {path}")
+
+        if prometheus_path:
+            atomic_write(prometheus_path, _to_prometheus(report))
+
+        return path
+
+
+def _to_prometheus(report: Dict) -> str:
+    """转换为 Prometheus textfile 格式"""
+
+    lines = [
+        '# TYPE news_push_stage_seconds summary',
+    ]
+    for stage, stats in report['stages'].items():
+        lines.append(f'news_push_stage_seconds_sum{{stage="{stage}"}} '
+                     f'{stats["total"]}')
+        lines.append(f'news_push_stage_seconds_count{{stage="{stage}"}} '
+                     f'{stats["count"]}')
+
+    lines.append('# TYPE news_push_counter gauge')
+    for name, value in report['counters'].items():
+        lines.append(f'news_push_counter{{name="{name}"}} {value}')
+
+    lines.append('# TYPE news_push_filter_items gauge')
+    for name, stats in report['filters'].items():
+        for direction in ('in', 'out'):
+            lines.append(f'news_push_filter_items{{filter="{name}",'
+                         f'direction="{direction}"}} {stats[direction]}')
+
+    lines.append('# TYPE news_push_last_run_timestamp gauge')
+    lines.append(f'news_push_last_run_timestamp {time.time():.0f}')
+
+    return '\n'.join(lines) + '\n'
+
+
+metrics = RunMetrics()
@@ -0,0 +1,180 @@
+import hashlib
+import math
+import re
+import sys
+from array import array
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from date_utils import parse_published
+
+SIMHASH_BITS = 64
+
+_TRACKING_PARAMS = {'spm', 'fbclid', 'gclid', 'ref', 'from', 'share'}
+_WORD_PATTERN = re.compile(r'[a-z0-9]+|[一-鿿]')
+
+
+def normalize_url(url: str) -> str:
+    """URL 归一化: 去掉协议差异、www、跟踪参数、锚点和末尾斜杠"""
+
+    if not url:
+        return ''
+
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    query = urlencode(
+        sorted((k, v) for k, v in parse_qsl(parts.query)
+               if not (k.lower().startswith('utm_')
+                       or k.lower() in _TRACKING_PARAMS)))
+    path = parts.path.rstrip('/') or '/'
+
+    return urlunsplit(('', host, path, query, ''))
+
+
+def tokenize(text: str) -> List[str]:
+    """切分为英文单词和中文单字 (输入需已转为小写)"""
+
+    return _WORD_PATTERN.findall(text)
+
+
+def simhash(text: str) -> int:
+    """计算 64 位 SimHash (英文按词三元组, 中文按字二元组)"""
+
+    tokens = tokenize(text.lower())
+    size = 3 if len(tokens) >= 3 and tokens[0].isascii() else 2
+    shingles = [
+        ' '.join(tokens[i:i + size])
+        for i in range(max(len(tokens) - size + 1, 1))
+    ]
+
+    # 按位转置后统计每一位上 1 的个数, 过半即置位
+    bits = [
+        format(
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode('utf-8'),
+                                digest_size=8).digest(), 'big'), '064b')
+        for shingle in shingles
+    ]
+    half = len(bits) / 2
+
+    fingerprint = 0
+    for position, column in enumerate(zip(*bits)):
+        if column.count('1') > half:
+            fingerprint |= 1 << (SIMHASH_BITS - 1 - position)
+
+    return fingerprint
+
+
+@dataclass(frozen=True, slots=True)
+class NewsItem:
+    """单条新闻, 归一化字段在创建时计算一次"""
+
+    category: str
+    title: str
+    url: str
+    content: str
+    score: float = 0.0
+    published_date: str = ''
+    query: str = ''
+    canonical_url: str = field(init=False, repr=False)
+    content_lower: str = field(init=False, repr=False, compare=False)
+    published_ts: Optional[float] = field(init=False, repr=False)
+    _fingerprint: Optional[int] = field(init=False,
+                                        default=None,
+                                        repr=False,
+                                        compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'category', sys.intern(self.category))
+        object.__setattr__(self, 'canonical_url', normalize_url(self.url))
+        object.__setattr__(self, 'content_lower', self.content.lower())
+        object.__setattr__(self, 'published_ts',
+                           parse_published(self.published_date))
+
+    @classmethod
+    def from_result(cls, category: str, query: str,
+                    result: Dict) -> 'NewsItem':
+        """由 Tavily 返回结果创建"""
+
+        return cls(category=category,
+                   query=query,
+                   title=result.get('title') or '',
+                   url=result.get('url') or '',
+                   content=(result.get('content') or '').strip(),
+                   score=float(result.get('score') or 0.0),
+                   published_date=result.get('published_date') or '')
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'NewsItem':
+        return cls(category=data.get('category', '其他'),
+                   query=data.get('query', ''),
+                   title=data.get('title', ''),
+                   url=data.get('url', ''),
+                   content=data.get('content', ''),
+                   score=float(data.get('score') or 0.0),
+                   published_date=data.get('published_date', ''))
+
+    def to_dict(self) -> Dict:
+        return {
+            'category': self.category,
+            'query': self.query,
+            'title': self.title,
+            'url': self.url,
+            'content': self.content,
+            'score': self.score,
+            'published_date': self.published_date
+        }
+
+    def with_content(self, content: str) -> 'NewsItem':
+        """替换正文 (如抓取到原文后), 派生字段随之重新计算"""
+
+        return replace(self, content=content)
+
+    @property
+    def fingerprint(self) -> int:
+        """内容 SimHash, 首次访问时计算"""
+
+        if self._fingerprint is None:
+            object.__setattr__(self, '_fingerprint', simhash(self.content))
+        return self._fingerprint
+
+
+class NewsBatch:
+    """列式存储的一批新闻, 大批量时比逐条对象更省内存, 也便于整列计算"""
+
+    __slots__ = ('categories', 'queries', 'titles', 'urls', 'contents',
+                 'scores', 'published_dates', 'published_ts')
+
+    def __init__(self):
+        self.categories: List[str] = []
+        self.queries: List[str] = []
+        self.titles: List[str] = []
+        self.urls: List[str] = []
+        self.contents: List[str] = []
+        self.scores = array('d')
+        self.published_dates: List[str] = []
+        self.published_ts = array('d')  # 缺失为 NaN
+
+    @classmethod
+    def from_items(cls, items: Iterable[NewsItem]) -> 'NewsBatch':
+        batch = cls()
+        for item in items:
+            batch.append(item)
+        return batch
+
+    def append(self, item: NewsItem):
+        self.categories.append(item.category)
+        self.queries.append(item.query)
+        self.titles.append(item.title)
+        self.urls.append(item.url)
+        self.contents.append(item.content)
+        self.scores.append(item.score)
+        self.published_dates.append(item.published_date)
+        self.published_ts.append(
+            math.nan if item.published_ts is None else item.published_ts)
+
+    def __len__(self) -> int:
+        return len(self.urls)
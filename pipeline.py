@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from typing import List, Dict, Optional, Tuple
+from config import Config
+from metrics import metrics
+from news_item import NewsItem
+from query_planner import PlannedQuery, default_plan
+
+logger = logging.getLogger(__name__)
+
+_SEARCH_DONE = object()
+
+
+class AsyncPipeline:
+    """异步流水线: 搜索、原文补全、过滤、分类摘要各阶段重叠执行
+
+    阶段之间通过有界队列连接, 下游处理不过来时上游自动等待;
+    某个分类的全部查询与补全完成后立即进入过滤和摘要, 不必等待其他分类。
+    """
+
+    def __init__(self,
+                 searcher,
+                 ai_processor,
+                 fetcher=None,
+                 deduplicator=None,
+                 watermarks=None,
+                 quality_filter=None):
+        self.searcher = searcher
+        self.ai_processor = ai_processor
+        self.fetcher = fetcher
+        self.deduplicator = deduplicator
+        self.watermarks = watermarks
+        self.quality_filter = quality_filter
+
+    def run(
+        self,
+        categories: Optional[List[str]] = None,
+        plan: Optional[List[PlannedQuery]] = None
+    ) -> Tuple[List[NewsItem], Dict[str, str], List[str]]:
+        """执行流水线, 返回 (参与摘要的新闻, 各分类摘要, 失败分类)
+
+        指定 plan 时只执行计划中的查询
+        """
+
+        return asyncio.run(self._run(categories, plan))
+
+    async def _run(
+        self, categories: Optional[List[str]],
+        plan: Optional[List[PlannedQuery]]
+    ) -> Tuple[List[NewsItem], Dict[str, str], List[str]]:
+        if plan is None:
+            plan = default_plan(Config.get_search_queries(categories))
+
+        search_queries = {}
+        for planned in plan:
+            search_queries.setdefault(planned.category, []).append(planned)
+
+        size = Config.PIPELINE.queue_size
+
+        fetch_queue = asyncio.Queue(maxsize=size)
+        collect_queue = asyncio.Queue(maxsize=size)
+        summarize_queue = asyncio.Queue(maxsize=size)
+
+        self._news_items = []
+        self._sections = {}
+        self._failed = []
+        self._inflight = {category: 0 for category in search_queries}
+        self._started = time.monotonic()
+        self._summarize_started = None
+
+        fetch_workers = [
+            asyncio.create_task(self._fetch_worker(fetch_queue,
+                                                   collect_queue))
+            for _ in range(max(Config.PIPELINE.fetch_workers, 1))
+        ]
+        summarize_workers = [
+            asyncio.create_task(self._summarize_worker(summarize_queue))
+            for _ in range(max(Config.OPENAI.map_concurrency, 1))
+        ]
+        collector = asyncio.create_task(
+            self._collect(collect_queue, summarize_queue, search_queries))
+
+        await self._search(search_queries, fetch_queue, collect_queue)
+
+        await fetch_queue.join()
+        for worker in fetch_workers:
+            worker.cancel()
+
+        await collector
+        await summarize_queue.join()
+        for worker in summarize_workers:
+            worker.cancel()
+
+        # 摘要阶段: 从第一个分类开始生成到全部分类完成
+        if self._summarize_started is not None:
+            metrics.observe('openai.analyze_and_summarize',
+                            time.monotonic() - self._summarize_started)
+
+        logger.info(f"流水线完成: {len(self._news_items)} 条新闻, "
+                    f"{len(self._sections)} 个分类摘要")
+
+        # 按配置中的分类顺序输出
+        sections = {
+            category: self._sections[category]
+            for category in search_queries if category in self._sections
+        }
+        return self._news_items, sections, self._failed
+
+    async def _search(self, search_queries: Dict[str, List[PlannedQuery]],
+                      fetch_queue: asyncio.Queue,
+                      collect_queue: asyncio.Queue):
+        """搜索阶段: 有限并发执行查询, 结果逐条送入补全队列"""
+
+        semaphore = asyncio.Semaphore(max(Config.TAVILY.concurrency, 1))
+
+        async def run_query(category: str, planned: PlannedQuery):
+            async with semaphore:
+                try:
+                    results = await asyncio.wait_for(
+                        asyncio.to_thread(self.searcher.search_query,
+                                          *planned),
+                        Config.TAVILY.query_timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"搜索超时 [{category}] {planned.query}")
+                    return
+
+            for item in results:
+                self._inflight[category] += 1
+                await fetch_queue.put(item)
+
+        async def run_category(category: str, queries: List[PlannedQuery]):
+            await asyncio.gather(*(run_query(category, planned)
+                                   for planned in queries))
+            await collect_queue.put((_SEARCH_DONE, category))
+
+        await asyncio.gather(*(run_category(category, queries)
+                               for category, queries in search_queries.items()))
+
+    async def _fetch_worker(self, fetch_queue: asyncio.Queue,
+                            collect_queue: asyncio.Queue):
+        """补全阶段: 内容过短时抓取原文"""
+
+        while True:
+            item = await fetch_queue.get()
+
+            try:
+                if self.fetcher and len(
+                        item.content) < Config.PIPELINE.fetch_min_chars:
+                    item = await self._enrich(item)
+            finally:
+                await collect_queue.put(item)
+                fetch_queue.task_done()
+
+    async def _enrich(self, item: NewsItem) -> NewsItem:
+        try:
+            text = await asyncio.wait_for(
+                asyncio.to_thread(self.fetcher.fetch, item.url),
+                Config.PIPELINE.fetch_timeout)
+        except asyncio.TimeoutError:
+            logger.debug(f"抓取超时: {item.url}")
+            return item
+
+        if text and len(text) > len(item.content):
+            return item.with_content(text)
+
+        return item
+
+    async def _collect(self, collect_queue: asyncio.Queue,
+                       summarize_queue: asyncio.Queue,
+                       search_queries: Dict[str, List[PlannedQuery]]):
+        """过滤阶段: 分类的搜索和补全全部完成后过滤去重, 送入摘要队列"""
+
+        buffers = {category: [] for category in search_queries}
+        searching = set(search_queries)
+        remaining = set(search_queries)
+        dedup_batch = None
+        if self.deduplicator:
+            dedup_batch = self.deduplicator.new_batch()
+
+        while remaining:
+            message = await collect_queue.get()
+
+            if isinstance(message, NewsItem):
+                category = message.category
+                buffers[category].append(message)
+                self._inflight[category] -= 1
+            else:
+                _, category = message
+                searching.discard(category)
+
+            if category in searching or self._inflight[category]:
+                # 该分类的结果尚未到齐
+                continue
+
+            remaining.discard(category)
+            items = self.searcher.filter_results(category,
+                                                 buffers.pop(category, []))
+            # 分类耗时: 从开始搜索到该分类结果到齐并完成过滤 (含原文补全)
+            metrics.observe('tavily.search_category',
+                            time.monotonic() - self._started)
+            if self.watermarks:
+                items = self.watermarks.filter_new(items)
+            if self.quality_filter:
+                items = self.quality_filter.filter(items)
+            if self.deduplicator:
+                items = self.deduplicator.deduplicate(items, dedup_batch)
+
+            if items:
+                self._news_items.extend(items)
+                await summarize_queue.put((category, items))
+            else:
+                logger.warning(f"[{category}] 未获取到任何新闻")
+
+    async def _summarize_worker(self, summarize_queue: asyncio.Queue):
+        """摘要阶段: 分类就绪后立即调用 LLM"""
+
+        while True:
+            category, items = await summarize_queue.get()
+            start = time.monotonic()
+            if self._summarize_started is None:
+                self._summarize_started = start
+
+            try:
+                section = await asyncio.wait_for(
+                    asyncio.to_thread(self.ai_processor.summarize_category,
+                                      category, items),
+                    Config.PIPELINE.summarize_timeout)
+
+                if section:
+                    self._sections[category] = section
+                    logger.info(f"[{category}] 摘要生成完成")
+            except asyncio.TimeoutError:
+                logger.error(f"[{category}] 摘要生成超时")
+                self._failed.append(category)
+            except Exception as e:
+                logger.error(f"[{category}] 摘要生成失败: {e}")
+                self._failed.append(category)
+            finally:
+                metrics.observe('openai.summarize_category',
+                                time.monotonic() - start)
+                summarize_queue.task_done()
@@ -0,0 +1,174 @@
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from metrics import metrics
+from news_item import NewsItem, tokenize
+
+logger = logging.getLogger(__name__)
+
+_SHORT_LINE_CHARS = 20  # 短于此长度的行视为导航、按钮、版权声明等模板文字
+_CJK_PATTERN = re.compile(r'[一-鿿]')
+_LATIN_PATTERN = re.compile(r'[a-z]')
+_LETTER_PATTERN = re.compile(r'[^\W\d_]')
+
+
+def load_rules() -> Tuple[List[str], List[str]]:
+    """读取屏蔽规则, 返回 (关键词列表, 正则列表)"""
+
+    keywords = [
+        kw.strip() for kw in Config.QUALITY.blocked_keywords.split(',')
+        if kw.strip()
+    ]
+    patterns = []
+
+    if Config.QUALITY.rules_path:
+        with open(Config.QUALITY.rules_path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        keywords.extend(rules.get('keywords', []))
+        patterns.extend(rules.get('patterns', []))
+
+    return keywords, patterns
+
+
+def boilerplate_ratio(text: str) -> float:
+    """短行字符数占全文的比例, 正文抽取残留的菜单、按钮越多比例越高"""
+
+    lengths = [len(line.strip()) for line in text.splitlines()]
+    total = sum(lengths)
+    if not total:
+        return 1.0
+
+    return sum(n for n in lengths if n < _SHORT_LINE_CHARS) / total
+
+
+def detect_language(text: str) -> str:
+    """按文字系统粗略判断语言: zh / en / other (输入需已转为小写)"""
+
+    letters = len(_LETTER_PATTERN.findall(text))
+    if not letters:
+        return 'other'
+
+    if len(_CJK_PATTERN.findall(text)) >= letters * 0.3:
+        return 'zh'
+    if len(_LATIN_PATTERN.findall(text)) >= letters * 0.7:
+        return 'en'
+    return 'other'
+
+
+class QualityFilter:
+    """内容质量过滤
+
+    全部屏蔽规则在初始化时编译为一个组合正则, 每条新闻只扫描一遍;
+    之后依次检查不同词数、模板文字占比和语言, 并按规则统计过滤数量。
+    """
+
+    def __init__(self,
+                 keywords: Optional[List[str]] = None,
+                 patterns: Optional[List[str]] = None):
+        if keywords is None and patterns is None:
+            keywords, patterns = load_rules()
+
+        self._rules = []
+        alternatives = []
+
+        for keyword in keywords or []:
+            alternatives.append(re.escape(keyword.lower()))
+            self._rules.append(f'keyword:{keyword.lower()}')
+
+        for pattern in patterns or []:
+            try:
+                # 按组合正则中的形式检查, (?i) 等全局标志只能出现在整个正则开头
+                re.compile(f'(?:{pattern})')
+            except re.error as e:
+                logger.error(f"质量规则无效, 已忽略: {pattern} ({e})")
+                continue
+            alternatives.append(pattern)
+            self._rules.append(f'pattern:{pattern}')
+
+        # 每条规则一个命名分组, 通过 lastgroup 得知命中的规则
+        self._matcher = None
+        if alternatives:
+            try:
+                self._matcher = self._combine(alternatives)
+            except re.error as e:
+                # 单独合法、组合后冲突的规则 (如分组名重复), 逐条加入并忽略冲突的
+                logger.error(f"质量规则组合失败, 逐条检查: {e}")
+                alternatives, self._rules = self._drop_conflicts(
+                    alternatives, self._rules)
+                self._matcher = (self._combine(alternatives)
+                                 if alternatives else None)
+
+        self.languages = {
+            lang.strip()
+            for lang in Config.QUALITY.languages.split(',') if lang.strip()
+        }
+
+        logger.info(f"质量过滤规则 {len(self._rules)} 条")
+
+    @staticmethod
+    def _combine(alternatives: List[str]) -> re.Pattern:
+        return re.compile('|'.join(
+            f'(?P<r{idx}>{alternative})'
+            for idx, alternative in enumerate(alternatives)))
+
+    def _drop_conflicts(self, alternatives: List[str], rules: List[str]):
+        kept, kept_rules = [], []
+        for alternative, rule in zip(alternatives, rules):
+            try:
+                self._combine(kept + [alternative])
+            except re.error as e:
+                logger.error(f"质量规则无效, 已忽略: {rule} ({e})")
+                continue
+            kept.append(alternative)
+            kept_rules.append(rule)
+        return kept, kept_rules
+
+    def check(self, item: NewsItem) -> Optional[str]:
+        """返回命中的规则名, 通过时返回 None"""
+
+        text = item.content_lower
+
+        if self._matcher:
+            match = self._matcher.search(text)
+            if match:
+                return self._rules[int(match.lastgroup[1:])]
+
+        if len(set(tokenize(text))) < Config.QUALITY.min_distinct_tokens:
+            return 'min_distinct_tokens'
+
+        ratio = boilerplate_ratio(item.content)
+        if ratio > Config.QUALITY.max_boilerplate_ratio:
+            return 'boilerplate'
+
+        if self.languages and detect_language(text) not in self.languages:
+            return 'language'
+
+        return None
+
+    def filter(self, news_items: List[NewsItem]) -> List[NewsItem]:
+        """过滤低质量新闻"""
+
+        kept = []
+        drops: Dict[str, int] = {}
+
+        for item in news_items:
+            rule = self.check(item)
+            if rule is None:
+                kept.append(item)
+                continue
+
+            drops[rule] = drops.get(rule, 0) + 1
+            logger.debug(f"质量过滤 [{rule}]: {item.title}")
+
+        for rule, count in drops.items():
+            metrics.incr(f'quality_drop.{rule}', count)
+        metrics.record_filter('quality', len(news_items), len(kept))
+
+        if drops:
+            detail = ', '.join(f"{rule} {count}" for rule, count in drops.items())
+            logger.info(f"质量过滤: 输入 {len(news_items)} 条, "
+                        f"保留 {len(kept)} 条 ({detail})")
+
+        return kept
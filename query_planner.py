@@ -0,0 +1,251 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from config import Config
+from metrics import metrics
+from news_item import NewsItem, normalize_url
+
+logger = logging.getLogger(__name__)
+
+# 查询中的日期 (如 "October 17 2026"), 统计时去掉, 同一查询跨天累计
+_DATE_PATTERN = re.compile(
+    r'\s*\b(?:January|February|March|April|May|June|July|August|September|'
+    r'October|November|December) \d{1,2} \d{4}\b')
+
+_URL_PATTERN = re.compile(r'https?://[^\s<>()\[\]]+')
+
+_EWMA_ALPHA = 0.3  # 新一次运行的权重
+
+
+class PlannedQuery(NamedTuple):
+    category: str
+    query: str
+    max_results: int
+    search_depth: str
+
+
+class QueryYield(NamedTuple):
+    """单个查询的历史产出 (指数滑动平均)"""
+
+    runs: int
+    skipped: int  # 连续跳过的次数
+    returned: float  # 搜索返回条数
+    kept: float  # 通过过滤、进入简报生成的条数
+    cited: float  # 简报中实际引用的条数
+
+    @property
+    def value(self) -> float:
+        """有效产出: 被引用的新闻权重更高"""
+
+        return self.kept + 2 * self.cited
+
+    @property
+    def precision(self) -> float:
+        return self.kept / self.returned if self.returned else 0.0
+
+
+def query_key(query: str) -> str:
+    return _DATE_PATTERN.sub('', query).strip().lower()
+
+
+def default_plan(search_queries: Dict[str, List[str]]) -> List[PlannedQuery]:
+    """按配置执行全部查询"""
+
+    return [
+        PlannedQuery(category, query, Config.TAVILY.max_results,
+                     Config.TAVILY.search_depth)
+        for category, queries in search_queries.items() for query in queries
+    ]
+
+
+def cited_urls(summary: str) -> set:
+    return {
+        normalize_url(url.rstrip('.,;:!?，。；：！？'))
+        for url in _URL_PATTERN.findall(summary)
+    }
+
+
+class QueryPlanner:
+    """按历史产出规划查询: 跳过长期无效的查询, 把结果数和搜索深度用在高产出的查询上
+
+    每次运行记录各查询的返回条数、通过过滤的条数和被简报引用的条数 (sqlite),
+    在每次运行的调用预算内按产出从高到低安排查询, 每个分类至少保留一个查询。
+    被跳过的查询每隔 explore_interval 次运行重新试探一次, 产出恢复后自动回到计划中。
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS query_yield ('
+                           'category TEXT NOT NULL, '
+                           'query_key TEXT NOT NULL, '
+                           'runs INTEGER NOT NULL, '
+                           'skipped INTEGER NOT NULL, '
+                           'returned REAL NOT NULL, '
+                           'kept REAL NOT NULL, '
+                           'cited REAL NOT NULL, '
+                           'updated_at REAL NOT NULL, '
+                           'PRIMARY KEY (category, query_key))')
+        self._conn.commit()
+
+    def stats(self) -> Dict[Tuple[str, str], QueryYield]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT category, query_key, runs, skipped, returned, kept, '
+                'cited FROM query_yield').fetchall()
+        return {(row[0], row[1]): QueryYield(*row[2:]) for row in rows}
+
+    def plan(self, search_queries: Dict[str, List[str]]) -> List[PlannedQuery]:
+        """生成本次运行的查询计划, 顺序与配置一致"""
+
+        stats = self.stats()
+        budget = Config.PLANNER.max_calls
+        known = [
+            s.value for s in stats.values() if s.runs >= Config.PLANNER.min_runs
+        ]
+        # 没有历史的查询按已知最高产出估计, 保证新查询有机会被试探
+        optimistic = max(known, default=1.0)
+
+        candidates = []
+        skipped = []
+        for category, queries in search_queries.items():
+            category_skipped = []
+            for position, query in enumerate(queries):
+                history = stats.get((category, query_key(query)))
+                params = self._params(history)
+
+                if params is None:
+                    category_skipped.append((history.value, position, query))
+                    continue
+
+                priority = (history.value if history and
+                            history.runs >= Config.PLANNER.min_runs else
+                            optimistic)
+                candidates.append((priority, category, position, query,
+                                   params))
+
+            if category_skipped and len(category_skipped) == len(queries):
+                # 分类的查询全部低产出时保留最好的一个, 以最低成本执行
+                value, position, query = max(category_skipped,
+                                             key=lambda s: (s[0], -s[1]))
+                candidates.append((value, category, position, query,
+                                   (Config.TAVILY.max_results, 'basic')))
+                category_skipped.remove((value, position, query))
+
+            skipped.extend(
+                (category, query) for _, _, query in category_skipped)
+
+        # 每个分类先保留产出最高的一个查询, 其余按产出竞争剩余预算
+        candidates.sort(key=lambda c: (-c[0], c[2]))
+        chosen, rest, covered = [], [], set()
+        for candidate in candidates:
+            if candidate[1] in covered:
+                rest.append(candidate)
+            else:
+                covered.add(candidate[1])
+                chosen.append(candidate)
+        chosen.extend(rest)
+
+        if budget > 0 and len(chosen) > budget:
+            for _, category, _, query, _ in chosen[budget:]:
+                skipped.append((category, query))
+            chosen = chosen[:budget]
+
+        order = {category: idx for idx, category in enumerate(search_queries)}
+        chosen.sort(key=lambda c: (order[c[1]], c[2]))
+
+        self._mark_skipped(skipped)
+        metrics.incr('planner.planned', len(chosen))
+        metrics.incr('planner.skipped', len(skipped))
+        logger.info(f"查询计划: 执行 {len(chosen)} 个, 跳过 {len(skipped)} 个" +
+                    (f" (预算 {budget})" if budget > 0 else ""))
+
+        return [
+            PlannedQuery(category, query, *params)
+            for _, category, _, query, params in chosen
+        ]
+
+    def _params(self, history: Optional[QueryYield]) -> Optional[Tuple[int, str]]:
+        """查询参数 (max_results, search_depth), 返回 None 表示本次跳过"""
+
+        max_results = Config.TAVILY.max_results
+        depth = Config.TAVILY.search_depth
+
+        if history is None or history.runs < Config.PLANNER.min_runs:
+            return max_results, depth
+
+        if history.value < Config.PLANNER.min_yield:
+            if history.skipped < Config.PLANNER.explore_interval:
+                return None
+            # 定期以最低成本试探一次
+            return max_results, 'basic'
+
+        if history.precision >= 0.8:
+            # 返回的结果大多有效, 多取一些
+            return min(max_results * 2, Config.PLANNER.max_results_cap), depth
+        if history.precision < 0.3:
+            # 结果大多被过滤, 少取并降低搜索深度
+            return max(max_results // 2, 1), 'basic'
+
+        return max_results, depth
+
+    def _mark_skipped(self, skipped: List[Tuple[str, str]]):
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE query_yield SET skipped = skipped + 1 '
+                'WHERE category = ? AND query_key = ?',
+                [(category, query_key(query)) for category, query in skipped])
+            self._conn.commit()
+
+    def record(self, returned: Dict[Tuple[str, str], int],
+               news_items: List[NewsItem], summary: str):
+        """记录本次运行各查询的产出
+
+        returned 为本次实际执行的查询及其返回条数, news_items 为送入简报生成的新闻
+        """
+
+        if not returned:
+            return
+
+        urls = cited_urls(summary)
+        kept = Counter((item.category, item.query) for item in news_items)
+        cited = Counter((item.category, item.query) for item in news_items
+                        if item.canonical_url and item.canonical_url in urls)
+
+        stats = self.stats()
+        now = time.time()
+        rows = []
+
+        for (category, query), count in returned.items():
+            key = (category, query_key(query))
+            old = stats.get(key)
+            current = (count, kept[(category, query)], cited[(category, query)])
+
+            if old is None:
+                runs, averages = 1, current
+            else:
+                runs = old.runs + 1
+                averages = tuple(
+                    (1 - _EWMA_ALPHA) * before + _EWMA_ALPHA * value
+                    for before, value in zip(
+                        (old.returned, old.kept, old.cited), current))
+
+            rows.append((*key, runs, 0, *averages, now))
+
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO query_yield VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+        logger.info(f"记录查询产出: {len(rows)} 个查询, "
+                    f"保留 {sum(kept.values())} 条, 引用 {sum(cited.values())} 条")
@@ -0,0 +1,128 @@
+import logging
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+import numpy as np
+from config import Config
+from news_item import NewsItem, NewsBatch, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOMAIN_WEIGHT = 0.5
+
+
+def parse_domain_weights(spec: str) -> Dict[str, float]:
+    """解析 "域名:权重,域名:权重" 格式的来源权重"""
+
+    weights = {}
+    for entry in spec.split(','):
+        domain, _, weight = entry.strip().partition(':')
+        if not domain or not weight:
+            continue
+        try:
+            weights[domain.lower().removeprefix('www.')] = float(weight)
+        except ValueError:
+            logger.warning(f"来源权重格式错误, 已忽略: {entry}")
+    return weights
+
+
+class NewsRanker:
+    """分类内排序: 综合相关度、新鲜度和来源权重, 再按 MMR 压低相似新闻
+
+    相似度使用 TF-IDF 向量的余弦相似度, 只取送入 LLM 的截断内容计算。
+    """
+
+    def __init__(self, domain_weights: Optional[Dict[str, float]] = None):
+        self.domain_weights = (domain_weights if domain_weights is not None
+                               else parse_domain_weights(
+                                   Config.RANKING.domain_weights))
+
+    def relevance(self, items: List[NewsItem]) -> np.ndarray:
+        """单条新闻的综合得分, 不考虑与其他新闻的相似度"""
+
+        batch = NewsBatch.from_items(items)
+        scores = np.frombuffer(batch.scores, dtype=np.float64)
+        published = np.frombuffer(batch.published_ts, dtype=np.float64)
+
+        age_hours = np.maximum((time.time() - published) / 3600, 0)
+        freshness = np.where(np.isnan(published), 0.5,
+                             1 / (1 + np.nan_to_num(age_hours) / 24))
+        domains = np.array([self._domain_weight(item) for item in items])
+
+        return (Config.RANKING.score_weight * scores +
+                Config.RANKING.freshness_weight * freshness +
+                Config.RANKING.domain_weight * domains)
+
+    def rank(self, items: List[NewsItem],
+             top_k: Optional[int] = None) -> List[NewsItem]:
+        """按 MMR 依次挑选: 综合得分高且与已选新闻不相似的优先"""
+
+        if len(items) < 2:
+            return list(items)
+
+        top_k = min(top_k or len(items), len(items))
+        relevance = self.relevance(items)
+        diversity = Config.RANKING.diversity
+
+        if diversity <= 0:
+            order = np.argsort(-relevance, kind='stable')[:top_k]
+            return [items[idx] for idx in order]
+
+        similarity = self._similarity(items)
+        max_similarity = np.zeros(len(items))
+        available = np.ones(len(items), dtype=bool)
+        selected = []
+
+        for _ in range(top_k):
+            marginal = np.where(
+                available,
+                (1 - diversity) * relevance - diversity * max_similarity,
+                -np.inf)
+            idx = int(np.argmax(marginal))
+
+            selected.append(idx)
+            available[idx] = False
+            max_similarity = np.maximum(max_similarity, similarity[idx])
+
+        return [items[idx] for idx in selected]
+
+    def _domain_weight(self, item: NewsItem) -> float:
+        """按来源域名取权重, 未配置时依次匹配上级域名"""
+
+        host = (urlsplit(item.url).hostname or '').removeprefix('www.')
+        while host:
+            if host in self.domain_weights:
+                return self.domain_weights[host]
+            _, _, host = host.partition('.')
+        return DEFAULT_DOMAIN_WEIGHT
+
+    @staticmethod
+    def _similarity(items: List[NewsItem]) -> np.ndarray:
+        """TF-IDF 余弦相似度矩阵"""
+
+        limit = Config.OPENAI.item_max_chars
+        counts = [
+            Counter(
+                tokenize(f"{item.title.lower()} {item.content_lower[:limit]}"))
+            for item in items
+        ]
+
+        vocabulary = {}
+        for count in counts:
+            for token in count:
+                vocabulary.setdefault(token, len(vocabulary))
+
+        matrix = np.zeros((len(items), max(len(vocabulary), 1)),
+                          dtype=np.float32)
+        for row, count in enumerate(counts):
+            columns = [vocabulary[token] for token in count]
+            matrix[row, columns] = list(count.values())
+
+        document_freq = np.count_nonzero(matrix, axis=0)
+        matrix *= np.log((1 + len(items)) / (1 + document_freq)) + 1
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        return matrix @ matrix.T
@@ -0,0 +1,257 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Optional
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """熔断中, 请求未发出"""
+
+
+def status_code(error: Exception) -> Optional[int]:
+    """从 requests / openai 的异常中取 HTTP 状态码"""
+
+    code = getattr(error, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code
+
+
+def is_retryable(error: Exception) -> bool:
+    """限流、服务端错误、超时和连接错误可以重试, 其余 (参数、鉴权错误) 直接失败"""
+
+    code = status_code(error)
+    if code is not None:
+        return code == 429 or code >= 500
+
+    name = type(error).__name__
+    return (isinstance(error, (ConnectionError, TimeoutError))
+            or 'Timeout' in name or 'Connection' in name)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """读取 Retry-After 响应头 (秒)"""
+
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶限流, 令牌不足时阻塞等待"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait_for = max(self._paused_until - now,
+                               (1 - self._tokens) / self.rate)
+
+            time.sleep(wait_for)
+
+    def pause(self, seconds: float):
+        """被服务端限流后整体暂停发放令牌, 所有并发请求一起放慢"""
+
+        with self._lock:
+            self._paused_until = max(self._paused_until,
+                                     time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断, 冷却期过后放行一次试探请求"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_closed(self) -> bool:
+        """正常放行 (非熔断, 也不在冷却后的试探期)"""
+
+        with self._lock:
+            return self._opened_at is None
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (self._opened_at is not None and
+                    time.monotonic() - self._opened_at < self.reset_timeout)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if (time.monotonic() - self._opened_at < self.reset_timeout
+                    or self._probing):
+                return False
+
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """记录失败, 本次失败导致熔断时返回 True"""
+
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                opened = self._opened_at is None or self._probing
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return opened
+            return False
+
+
+class ResilientClient:
+    """外部服务调用包装: 限流、指数退避重试 (带抖动)、熔断和对冲请求
+
+    每个服务一个实例, 同一服务的所有并发调用共享令牌桶和熔断状态。
+    """
+
+    def __init__(self,
+                 name: str,
+                 rate: float,
+                 burst: int = 1,
+                 max_retries: Optional[int] = None,
+                 hedge_workers: int = 0):
+        self.name = name
+        self.max_retries = (Config.RESILIENCE.max_retries
+                            if max_retries is None else max_retries)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(Config.RESILIENCE.failure_threshold,
+                                      Config.RESILIENCE.reset_timeout)
+        self._executor = (ThreadPoolExecutor(
+            max_workers=hedge_workers, thread_name_prefix=f'{name}-hedge')
+                          if hedge_workers else None)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """调用 func, 可重试的错误按退避间隔重试, 最终失败时抛出最后一次的异常"""
+
+        return self._retry(lambda: func(*args, **kwargs))
+
+    def hedged(self, after: float, func: Callable, *args, **kwargs):
+        """对冲请求: 单次尝试超过 after 秒未返回时再发一个, 取先成功的结果
+
+        计时只针对进行中的单次尝试, 重试前的退避等待不计入; 熔断试探期间不对冲
+        """
+
+        if not self._executor or after <= 0:
+            return self.call(func, *args, **kwargs)
+
+        return self._retry(
+            lambda: self._hedged_attempt(after, func, args, kwargs))
+
+    def _retry(self, attempt_func: Callable):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                metrics.incr(f'{self.name}.circuit_rejected')
+                raise CircuitOpenError(f"{self.name} 熔断中, 暂停调用")
+
+            self.bucket.acquire()
+
+            try:
+                result = attempt_func()
+            except Exception as e:
+                if not is_retryable(e):
+                    # 请求本身有问题, 服务是健康的
+                    self.breaker.record_success()
+                    raise
+
+                if self.breaker.record_failure():
+                    metrics.incr(f'{self.name}.circuit_opened')
+                    logger.error(f"{self.name} 连续失败, 熔断 "
+                                 f"{Config.RESILIENCE.reset_timeout:.0f}s")
+
+                if attempt == self.max_retries or self.breaker.is_open:
+                    raise
+
+                delay = self._backoff(attempt, e)
+                metrics.incr(f'{self.name}.retries')
+                logger.warning(f"{self.name} 调用失败, {delay:.1f}s 后重试 "
+                               f"({attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def _hedged_attempt(self, after: float, func: Callable, args, kwargs):
+        """单次尝试: 请求超过 after 秒未返回且服务状态正常时发出对冲请求
+
+        两个请求都失败时抛出最后一个异常, 由 _retry 按一次失败处理
+        """
+
+        primary = self._executor.submit(func, *args, **kwargs)
+        done, _ = wait([primary], timeout=after)
+        if done or not self.breaker.is_closed:
+            return primary.result()
+
+        self.bucket.acquire()
+        if primary.done():
+            return primary.result()
+
+        metrics.incr(f'{self.name}.hedged')
+        backup = self._executor.submit(func, *args, **kwargs)
+        pending = {primary, backup}
+        error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+
+        raise error
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(
+            0,
+            min(Config.RESILIENCE.max_delay,
+                Config.RESILIENCE.base_delay * 2**attempt))
+
+        if status_code(error) == 429:
+            metrics.incr(f'{self.name}.rate_limited')
+            delay = max(delay, retry_after(error) or 0)
+            self.bucket.pause(delay)
+
+        return delay
@@ -0,0 +1,187 @@
+import gzip
+import json
+import logging
+import os
+import secrets
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from news_item import NewsItem
+from storage import atomic_replace
+
+logger = logging.getLogger(__name__)
+
+# 按执行顺序排列的阶段
+STAGES = ('search', 'filtered', 'brief', 'delivery')
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def read_items(path: str) -> List[NewsItem]:
+    """读取新闻列表: 每行一条 JSON, 或整个文件为 JSON 数组
+
+    .gz 结尾的文件按 gzip 解压, "-" 为标准输入
+    """
+
+    if path == '-':
+        text = sys.stdin.read()
+    else:
+        with _open(path, 'r') as f:
+            text = f.read()
+
+    if text.lstrip().startswith('['):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    return [NewsItem.from_dict(record) for record in records]
+
+
+def write_items(items: List[NewsItem], path: str):
+    """按每行一条 JSON 写出新闻列表, .gz 结尾时压缩, "-" 为标准输出"""
+
+    lines = ''.join(
+        json.dumps(item.to_dict(), ensure_ascii=False) + '\n' for item in items)
+
+    if path == '-':
+        sys.stdout.write(lines)
+        return
+
+    with _open(path, 'w') as f:
+        f.write(lines)
+
+
+class RunArtifacts:
+    """单次运行各阶段的产物: 原始搜索结果、过滤后的新闻、简报和推送结果
+
+    每个阶段的产物写完后再记入 manifest.json, 重跑时从最后完成的阶段继续,
+    不再重复搜索和调用 LLM。新闻列表为 gzip 压缩的 JSON Lines,
+    可直接作为 summarize-from-file 和基准测试的输入。
+    """
+
+    def __init__(self, root: str, run_id: str):
+        self.run_id = run_id
+        self.directory = os.path.join(root, run_id)
+        self.manifest = {'run_id': run_id, 'stages': {}}
+
+        manifest_path = os.path.join(self.directory, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    @classmethod
+    def create(cls, root: str,
+               categories: Optional[List[str]]) -> 'RunArtifacts':
+        run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(3)}"
+        artifacts = cls(root, run_id)
+        artifacts.manifest.update(categories=categories, created_at=time.time())
+        artifacts._write_manifest()
+        return artifacts
+
+    @classmethod
+    def load(cls, root: str,
+             run_id: Optional[str] = None) -> Optional['RunArtifacts']:
+        """读取指定的运行, 不指定时取最近一次; 不存在时返回 None"""
+
+        if run_id is None:
+            runs = sorted(os.listdir(root)) if os.path.isdir(root) else []
+            if not runs:
+                return None
+            run_id = runs[-1]
+
+        if not os.path.exists(os.path.join(root, run_id, 'manifest.json')):
+            return None
+        return cls(root, run_id)
+
+    @staticmethod
+    def prune(root: str, retention_days: int):
+        """删除超过保留天数的运行"""
+
+        if not os.path.isdir(root):
+            return
+
+        cutoff = time.time() - retention_days * 86400
+        for run_id in os.listdir(root):
+            directory = os.path.join(root, run_id)
+            if os.path.getmtime(directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    @property
+    def categories(self) -> Optional[List[str]]:
+        return self.manifest.get('categories')
+
+    @property
+    def finished(self) -> bool:
+        """已至少推送到一个渠道"""
+
+        delivery = self.stage('delivery')
+        return bool(delivery and delivery['success'])
+
+    def stage(self, name: str) -> Optional[Dict]:
+        """已完成阶段的记录, 未完成时返回 None"""
+
+        return self.manifest['stages'].get(name)
+
+    def last_stage(self) -> Optional[str]:
+        completed = [name for name in STAGES if self.stage(name)]
+        return completed[-1] if completed else None
+
+    def annotate(self, **fields):
+        """记录运行信息 (如本次搜索的查询), 恢复时使用"""
+
+        self.manifest.update(fields)
+        self._write_manifest()
+
+    def save_items(self, stage: str, items: List[NewsItem]):
+        path = os.path.join(self.directory, f'{stage}.jsonl.gz')
+        if self._write(path, lambda tmp_path: write_items(items, tmp_path)):
+            self.complete(stage, count=len(items))
+
+    def load_items(self, stage: str) -> List[NewsItem]:
+        return read_items(os.path.join(self.directory, f'{stage}.jsonl.gz'))
+
+    def save_brief(self, subject: str, summary: str):
+        path = os.path.join(self.directory, 'brief.json.gz')
+
+        def write(tmp_path: str):
+            with _open(tmp_path, 'w') as f:
+                json.dump({'subject': subject, 'summary': summary},
+                          f,
+                          ensure_ascii=False)
+
+        if self._write(path, write):
+            self.complete('brief')
+
+    def load_brief(self) -> Dict[str, str]:
+        with _open(os.path.join(self.directory, 'brief.json.gz'), 'r') as f:
+            return json.load(f)
+
+    def complete(self, stage: str, **details):
+        self.manifest['stages'][stage] = {'completed_at': time.time(), **details}
+        self._write_manifest()
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, 'manifest.json')
+
+        def write(tmp_path: str):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+
+        self._write(path, write)
+
+    @staticmethod
+    def _write(path: str, write) -> bool:
+        """原子写入, 写入失败不影响本次运行"""
+
+        try:
+            atomic_replace(path, write)
+            return True
+        except OSError as e:
+            logger.warning(f"运行产物写入失败 [{path}]: {e}")
+            return False
@@ -0,0 +1,98 @@
+import logging
+import signal
+import threading
+from typing import List, Optional, Tuple
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_schedules() -> List[Tuple[str, Optional[List[str]]]]:
+    """解析计划配置, 返回 [(cron 表达式, 分类列表或 None)]"""
+
+    if not Config.SCHEDULE.schedules:
+        hour, minute = Config.SCHEDULE_TIME.split(':')
+        return [(f"{int(minute)} {int(hour)} * * *", None)]
+
+    schedules = []
+    for spec in Config.SCHEDULE.schedules.split(';'):
+        spec = spec.strip()
+        if not spec:
+            continue
+
+        expression, _, categories = spec.partition('@')
+        category_list = [c.strip() for c in categories.split(',') if c.strip()]
+        schedules.append((expression.strip(), category_list or None))
+
+    return schedules
+
+
+class NewsScheduler:
+    """常驻调度器: 复用已初始化的客户端, 按 cron 计划运行各分类"""
+
+    def __init__(self, aggregator):
+        self.aggregator = aggregator
+        self.scheduler = BlockingScheduler(timezone=Config.SCHEDULE.timezone)
+
+        # 不同计划之间也不允许重叠, 避免慢任务与下一次触发叠加
+        self._run_lock = threading.Lock()
+
+        for idx, (expression, categories) in enumerate(parse_schedules()):
+            trigger = CronTrigger.from_crontab(
+                expression, timezone=Config.SCHEDULE.timezone)
+            self.scheduler.add_job(self._run,
+                                   trigger,
+                                   id=f"news_{idx}",
+                                   name=f"{expression} "
+                                   f"[{', '.join(categories or ['全部'])}]",
+                                   kwargs={'categories': categories},
+                                   max_instances=1,
+                                   coalesce=True,
+                                   misfire_grace_time=Config.SCHEDULE.misfire_grace)
+
+        # 推送失败的消息在两次任务之间独立重试
+        self.scheduler.add_job(self._retry_delivery,
+                               'interval',
+                               seconds=Config.DELIVERY.retry_interval,
+                               id='outbox_retry',
+                               name='outbox 重试',
+                               max_instances=1,
+                               coalesce=True)
+
+    def _run(self, categories: Optional[List[str]]):
+        """执行一次任务, 上一次未结束时等待, 超过补跑窗口则放弃"""
+
+        if not self._run_lock.acquire(timeout=Config.SCHEDULE.misfire_grace):
+            logger.warning(f"上一次任务仍在运行, 跳过本次: "
+                           f"{', '.join(categories or ['全部'])}")
+            return
+
+        try:
+            self.aggregator.run(categories)
+        finally:
+            self._run_lock.release()
+
+    def _retry_delivery(self):
+        try:
+            self.aggregator.delivery.retry_pending()
+        except Exception as e:
+            logger.error(f"outbox 重试失败: {e}")
+
+    def start(self):
+        """启动调度 (阻塞)"""
+
+        for job in self.scheduler.get_jobs():
+            logger.info(f"已加载计划: {job.name}")
+
+        signal.signal(signal.SIGTERM, lambda *_: self.scheduler.shutdown(
+            wait=False))
+
+        logger.info("调度器启动")
+        try:
+            self.scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+
+        logger.info("调度器已停止")
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+def atomic_replace(path: str, write: Callable[[str], None]):
+    """先写临时文件再替换, 中断时不会留下半个文件
+
+    write 接收临时文件路径; path 以 .gz 结尾时临时文件同样以 .gz 结尾
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + '.tmp' + ('.gz' if path.endswith('.gz') else '')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def atomic_write(path: str, text: str):
+    """原子地写入文本文件"""
+
+    def write(tmp_path: str):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    atomic_replace(path, write)
+
+
+class SqliteCache:
+    """文本磁盘缓存 (sqlite, TTL + LRU 淘汰), 多线程共享一个连接
+
+    name 决定表名 ({name}_cache), column 为存放缓存内容的列名
+    """
+
+    def __init__(self, path: str, name: str, column: str, ttl: int,
+                 max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._table = table = f'{name}_cache'
+        self._column = column
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ('
+                           'key TEXT PRIMARY KEY, '
+                           f'{column} TEXT NOT NULL, '
+                           'created_at REAL NOT NULL, '
+                           'accessed_at REAL NOT NULL)')
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_accessed '
+                           f'ON {table} (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存, 命中时刷新访问时间"""
+
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {self._column}, created_at FROM {self._table} '
+                'WHERE key = ?', (key, )).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                f'UPDATE {self._table} SET accessed_at = ? WHERE key = ?',
+                (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return row[0]
+
+    def put(self, key: str, value: str):
+        """写入缓存并按 LRU 淘汰超出容量的条目"""
+
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self._table} '
+                f'(key, {self._column}, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?)', (key, value, now, now))
+            self._conn.execute(
+                f'DELETE FROM {self._table} WHERE created_at < ?',
+                (now - self.ttl, ))
+            self._conn.execute(
+                f'DELETE FROM {self._table} WHERE key IN ('
+                f'SELECT key FROM {self._table} ORDER BY accessed_at DESC '
+                'LIMIT -1 OFFSET ?)', (self.max_entries, ))
+            self._conn.commit()
+
+    def reset_stats(self):
+        """清零命中统计, 常驻进程中每次运行单独统计"""
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+
+        return {'hits': self.hits, 'misses': self.misses}
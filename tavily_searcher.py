@@ -1,12 +1,48 @@
+import hashlib
+import json
 import logging
-from typing import List, Dict
-from datetime import datetime, timedelta
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple, Optional
 from tavily import TavilyClient
 from config import Config
+from metrics import metrics
+from news_item import NewsItem, NewsBatch
+from query_planner import PlannedQuery, default_plan
+from resilience import ResilientClient
+from storage import SqliteCache
 
 logger = logging.getLogger(__name__)
 
 
+class SearchCache(SqliteCache):
+    """Tavily 搜索结果磁盘缓存 (sqlite, TTL + LRU 淘汰)"""
+
+    def __init__(self, path: str, ttl: int, max_entries: int):
+        super().__init__(path, 'search', 'response', ttl, max_entries)
+
+    @staticmethod
+    def make_key(query: str, **params) -> str:
+        """由归一化查询词和搜索参数生成缓存键"""
+
+        normalized = ' '.join(query.lower().split())
+        payload = json.dumps({
+            'query': normalized,
+            **params
+        },
+                             sort_keys=True,
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        cached = super().get(key)
+        return None if cached is None else json.loads(cached)
+
+    def put(self, key: str, response: Dict):
+        super().put(key, json.dumps(response, ensure_ascii=False))
+
+
 class TavilySearcher:
     """Tavily 搜索器"""
 
@@ -15,103 +51,259 @@ class TavilySearcher:
             raise ValueError("Tavily API Key 未配置")
 
         self.client = TavilyClient(api_key=Config.TAVILY.api_key)
+        if Config.TAVILY.base_url:
+            self.client.base_url = Config.TAVILY.base_url
+        self.resilience = ResilientClient(
+            'tavily',
+            Config.RESILIENCE.tavily_rate,
+            burst=Config.TAVILY.concurrency,
+            hedge_workers=Config.TAVILY.concurrency * 2)
         logger.info("Tavily 客户端初始化成功")
 
-    def search_category(self, category: str, queries: List[str]) -> List[Dict]:
+        self.cache = None
+        if Config.TAVILY.cache_path:
+            self.cache = SearchCache(Config.TAVILY.cache_path,
+                                     Config.TAVILY.cache_ttl,
+                                     Config.TAVILY.cache_max_entries)
+            logger.info(f"搜索缓存: {Config.TAVILY.cache_path} "
+                        f"(TTL {Config.TAVILY.cache_ttl}s)")
+
+        # 各查询 (分类, 查询) 的返回条数, 供查询规划统计产出
+        self.returned: Dict[Tuple[str, str], int] = {}
+
+    @metrics.timed('tavily.search_category')
+    def search_category(self, category: str,
+                        queries: List[PlannedQuery]) -> List[NewsItem]:
         """搜索单个分类"""
 
         results = []
 
-        for query in queries:
-            try:
-                logger.info(f"搜索: [{category}] {query}")
-
-                response = self.client.search(
-                    query=query,
-                    search_depth=Config.TAVILY.search_depth,
-                    max_results=Config.TAVILY.max_results,
-                    days=Config.TAVILY.days,
-                    include_domains=None,
-                    exclude_domains=None)
-
-                if response and 'results' in response:
-                    for item in response['results']:
-                        content = item.get('content', '').strip()
-
-                        # 跳过无效内容
-                        if not content or len(content) < 50:
-                            continue
-
-                        results.append({
-                            'category':
-                            category,
-                            'title':
-                            item.get('title', ''),
-                            'url':
-                            item.get('url', ''),
-                            'content':
-                            content,
-                            'score':
-                            item.get('score', 0.0),
-                            'published_date':
-                            item.get('published_date', '')
-                        })
-
-                    logger.info(f"获取 {len(response['results'])} 条结果")
-                else:
-                    logger.warning(f"搜索无结果: {query}")
-
-            except Exception as e:
-                logger.error(f"搜索失败 [{query}]: {e}")
+        for planned in queries:
+            results.extend(
+                self.search_query(category, planned.query,
+                                  planned.max_results, planned.search_depth))
+
+        return self.filter_results(category, results)
+
+    def filter_results(self, category: str,
+                       results: List[NewsItem]) -> List[NewsItem]:
+        """过滤单个分类的搜索结果"""
 
         filtered_results = self._filter_recent_news(results)
+        metrics.record_filter('recent_news', len(results),
+                              len(filtered_results))
         logger.info(f"[{category}] 有效新闻: {len(filtered_results)} 条")
 
         return filtered_results
 
-    def _filter_recent_news(self, news_list: List[Dict]) -> List[Dict]:
-        """过滤 24 小时内的新闻"""
+    def search_query(self,
+                     category: str,
+                     query: str,
+                     max_results: Optional[int] = None,
+                     search_depth: Optional[str] = None) -> List[NewsItem]:
+        """执行单个查询, 不指定结果数和搜索深度时使用配置"""
 
-        cutoff_time = datetime.now() - timedelta(days=1)
-        filtered = []
+        results = []
 
-        for news in news_list:
-            pub_date = news.get('published_date', '')
+        try:
+            logger.info(f"搜索: [{category}] {query}")
 
-            if not pub_date:
-                filtered.append(news)
-                continue
+            with metrics.timer('tavily.search'):
+                response = self._cached_search(query, max_results,
+                                               search_depth)
+
+            if response and 'results' in response:
+                self.returned[(category, query)] = len(response['results'])
+                for result in response['results']:
+                    item = NewsItem.from_result(category, query, result)
+
+                    # 跳过无效内容
+                    if len(item.content) < 50:
+                        continue
+
+                    results.append(item)
+
+                metrics.record_filter('min_content', len(response['results']),
+                                      len(results))
+                logger.info(f"获取 {len(response['results'])} 条结果")
+            else:
+                self.returned[(category, query)] = 0
+                logger.warning(f"搜索无结果: {query}")
+
+        except Exception as e:
+            metrics.incr('tavily.errors')
+            logger.error(f"搜索失败 [{query}]: {e}")
+
+        return results
+
+    def _cached_search(self,
+                       query: str,
+                       max_results: Optional[int] = None,
+                       search_depth: Optional[str] = None) -> Dict:
+        """带缓存的 Tavily 查询"""
 
+        params = {
+            'search_depth': search_depth or Config.TAVILY.search_depth,
+            'max_results': max_results or Config.TAVILY.max_results,
+            'days': Config.TAVILY.days
+        }
+
+        key = None
+        if self.cache:
+            key = SearchCache.make_key(query, **params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.incr('tavily.cache_hits')
+                logger.info(f"命中搜索缓存: {query}")
+                return cached
+
+        def search() -> Dict:
+            metrics.incr('tavily.api_calls')
+            return self.client.search(query=query,
+                                      include_domains=None,
+                                      exclude_domains=None,
+                                      **params)
+
+        response = self.resilience.hedged(Config.RESILIENCE.tavily_hedge_after,
+                                          search)
+
+        if self.cache and response and response.get('results'):
+            self.cache.put(key, response)
+
+        return response
+
+    def _search_concurrently(
+        self, tasks: List[PlannedQuery]
+    ) -> Tuple[List[List[NewsItem]], Dict[int, float]]:
+        """并发执行查询, 返回结果 (与 tasks 顺序一一对应) 和各查询的完成时间"""
+
+        results = [[] for _ in tasks]
+        started = {}
+        finished = {}
+        timeout = Config.TAVILY.query_timeout
+
+        def run(idx: int, planned: PlannedQuery) -> List[NewsItem]:
+            started[idx] = time.monotonic()
             try:
-                news_time = datetime.fromisoformat(
-                    pub_date.replace('Z', '+00:00'))
+                return self.search_query(*planned)
+            finally:
+                finished[idx] = time.monotonic()
+
+        executor = ThreadPoolExecutor(max_workers=Config.TAVILY.concurrency,
+                                      thread_name_prefix='tavily')
+        futures = {
+            executor.submit(run, idx, planned): idx
+            for idx, planned in enumerate(tasks)
+        }
+        pending = set(futures)
+
+        try:
+            while pending:
+                done, pending = wait(pending,
+                                     timeout=0.5,
+                                     return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    results[futures[future]] = future.result()
+
+                # 超过单次查询期限的请求直接放弃, 不阻塞其余分类
+                now = time.monotonic()
+                for future in list(pending):
+                    idx = futures[future]
+                    if idx in started and now - started[idx] > timeout:
+                        category, query = tasks[idx][:2]
+                        logger.error(f"搜索超时 [{category}] {query} "
+                                     f"(>{timeout:.0f}s)")
+                        pending.discard(future)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-                if news_time >= cutoff_time:
-                    filtered.append(news)
-                else:
-                    logger.debug(f"过滤旧新闻: {news['title']} ({pub_date})")
+        return results, finished
 
-            except Exception as e:
-                logger.warning(f"时间解析失败: {pub_date} - {e}")
+    def _filter_recent_news(self,
+                            news_list: List[NewsItem]) -> List[NewsItem]:
+        """过滤最近 days 天内的新闻 (无发布时间或无法解析的保留)"""
+
+        cutoff_ts = time.time() - Config.TAVILY.days * 86400
+        batch = NewsBatch.from_items(news_list)
+        filtered = []
+        unparsed = 0
+
+        for news, news_ts in zip(news_list, batch.published_ts):
+            if math.isnan(news_ts):
+                # 无发布时间或无法解析, 保留
+                unparsed += bool(news.published_date)
                 filtered.append(news)
+            elif news_ts >= cutoff_ts:
+                filtered.append(news)
+            else:
+                logger.debug(f"过滤旧新闻: {news.title} ({news.published_date})")
+
+        if unparsed:
+            logger.warning(f"时间解析失败 {unparsed} 条, 已保留")
 
         return filtered
 
-    def search_all_categories(self) -> List[Dict]:
-        """搜索所有分类"""
+    @metrics.timed('tavily.search_all_categories')
+    def search_all_categories(
+            self,
+            categories: Optional[List[str]] = None,
+            plan: Optional[List[PlannedQuery]] = None) -> List[NewsItem]:
+        """搜索所有分类 (或指定分类), 指定 plan 时只执行计划中的查询"""
 
         all_results = []
-        search_queries = Config.get_search_queries()
+        if plan is None:
+            plan = default_plan(Config.get_search_queries(categories))
 
-        for category, queries in search_queries.items():
-            logger.info(f"开始搜索 [{category}] 类新闻")
-            category_results = self.search_category(category, queries)
+        if self.cache:
+            self.cache.reset_stats()
 
+        search_queries = {}
+        for planned in plan:
+            search_queries.setdefault(planned.category, []).append(planned)
+
+        if Config.TAVILY.concurrency > 1:
+            tasks = plan
+            logger.info(f"并发搜索 {len(tasks)} 个查询 "
+                        f"(并发数 {Config.TAVILY.concurrency})")
+            start = time.monotonic()
+            query_results, finished = self._search_concurrently(tasks)
+            end = time.monotonic()
+
+            per_category = {category: [] for category in search_queries}
+            ready = {category: start for category in search_queries}
+            for idx, (planned, results) in enumerate(zip(tasks, query_results)):
+                per_category[planned.category].extend(results)
+                ready[planned.category] = max(ready[planned.category],
+                                              finished.get(idx, end))
+
+            # 分类耗时: 从开始搜索到该分类最后一个查询完成, 加上过滤耗时
+            category_results_map = {}
+            for category, results in per_category.items():
+                filter_start = time.monotonic()
+                category_results_map[category] = self.filter_results(
+                    category, results)
+                metrics.observe(
+                    'tavily.search_category', ready[category] - start +
+                    time.monotonic() - filter_start)
+        else:
+            category_results_map = {}
+            for category, queries in search_queries.items():
+                logger.info(f"开始搜索 [{category}] 类新闻")
+                category_results_map[category] = self.search_category(
+                    category, queries)
+
+        for category, category_results in category_results_map.items():
             if category_results:
                 all_results.extend(category_results)
                 logger.info(f"[{category}] 获取 {len(category_results)} 条")
             else:
                 logger.warning(f"[{category}] 未获取到任何新闻")
 
+        if self.cache:
+            stats = self.cache.stats()
+            logger.info(f"搜索缓存命中 {stats['hits']} 次, "
+                        f"未命中 {stats['misses']} 次")
+
         logger.info(f"总计获取 {len(all_results)} 条新闻")
         return all_results
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from typing import List, Dict
+from config import Config
+from metrics import metrics
+from news_item import NewsItem
+from query_planner import query_key
+
+logger = logging.getLogger(__name__)
+
+
+def item_id(item: NewsItem) -> str:
+    """新闻唯一标识: 优先使用 URL, 没有 URL 时使用标题和内容"""
+
+    key = item.url or f"{item.title}\n{item.content[:200]}"
+    return hashlib.sha1(key.strip().lower().encode('utf-8')).hexdigest()
+
+
+class WatermarkStore:
+    """增量模式状态: 每个查询上次成功推送的时间水位, 以及已处理过的新闻 ID
+
+    水位按去掉日期的查询 (query_key) 记录, 查询中带当天日期时水位跨天延续
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS watermarks ('
+                           'category TEXT NOT NULL, '
+                           'query TEXT NOT NULL, '
+                           'watermark REAL NOT NULL, '
+                           'PRIMARY KEY (category, query))')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS seen_items ('
+                           'item_id TEXT PRIMARY KEY, '
+                           'seen_at REAL NOT NULL)')
+        self._conn.commit()
+
+        retention = time.time() - Config.INCREMENTAL.seen_retention_days * 86400
+        self._conn.execute('DELETE FROM seen_items WHERE seen_at < ?',
+                           (retention, ))
+        # 长期未再执行的查询
+        self._conn.execute('DELETE FROM watermarks WHERE watermark < ?',
+                           (retention, ))
+        self._conn.commit()
+
+    def watermarks(self) -> Dict[tuple, float]:
+        rows = self._conn.execute(
+            'SELECT category, query, watermark FROM watermarks')
+        return {(category, query): mark for category, query, mark in rows}
+
+    def filter_new(self, news_items: List[NewsItem]) -> List[NewsItem]:
+        """只保留上次成功推送之后的新内容"""
+
+        if not news_items:
+            return []
+
+        marks = self.watermarks()
+        ids = [item_id(item) for item in news_items]
+        seen = self._seen(ids)
+        overlap = Config.INCREMENTAL.overlap_seconds
+
+        fresh = []
+        for item, news_id in zip(news_items, ids):
+            if news_id in seen:
+                continue
+
+            mark = marks.get((item.category, query_key(item.query)))
+            published = item.published_ts
+            if mark and published and published < mark - overlap:
+                continue
+
+            fresh.append(item)
+
+        metrics.record_filter('incremental', len(news_items), len(fresh))
+        logger.info(f"增量过滤: 输入 {len(news_items)} 条, 新内容 {len(fresh)} 条")
+
+        return fresh
+
+    def commit(self,
+               queries: Dict[str, List[str]],
+               news_items: List[NewsItem],
+               started_at: float,
+               pending: List[NewsItem] = ()):
+        """推送成功后推进水位并记录已推送新闻
+
+        水位取本次搜索开始的时间, 运行期间新发布的新闻留给下一次;
+        pending 为通过过滤但未写入简报的新闻, 其所在查询的水位不越过这些新闻的发布时间
+        """
+
+        marks = {(category, query_key(query)): started_at
+                 for category, items in queries.items() for query in items}
+        for item in pending:
+            key = (item.category, query_key(item.query))
+            if key in marks and item.published_ts:
+                marks[key] = min(marks[key], item.published_ts)
+
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)',
+            [(category, query, mark)
+             for (category, query), mark in marks.items()])
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO seen_items VALUES (?, ?)',
+            [(item_id(item), started_at) for item in news_items])
+        self._conn.commit()
+
+        logger.info(f"更新增量水位: {sum(len(q) for q in queries.values())} 个查询, "
+                    f"{len(news_items)} 条新闻")
+
+    def _seen(self, ids: List[str]) -> set:
+        seen = set()
+        # sqlite 单条语句的参数个数有限, 分批查询
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self._conn.execute(
+                f'SELECT item_id FROM seen_items WHERE item_id IN ({placeholders})',
+                batch)
+            seen.update(row[0] for row in rows)
+        return seen
@@ -0,0 +1,47 @@
+import hashlib
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+import requests
+from config import Config
+from metrics import metrics
+from markdown_renderer import to_text
+from resilience import ResilientClient
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookNotifier:
+    """Webhook 推送: 以 JSON POST 简报, 附带幂等键请求头"""
+
+    def __init__(self, url: str):
+        self.url = url
+        # 同一主机上常有多个 webhook (Slack、飞书、钉钉), 渠道名带上完整 URL 的短哈希
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+        self.name = f"webhook.{urlsplit(url).netloc}.{digest}"
+        self.resilience = ResilientClient(self.name, 0)
+
+    def send(self,
+             title: str,
+             content: str,
+             idempotency_key: Optional[str] = None) -> bool:
+        """发送推送消息"""
+
+        payload = {'title': title, 'markdown': content, 'text': to_text(content)}
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+
+        try:
+            self.resilience.call(self._post, payload, headers)
+            logger.info(f"Webhook 推送成功: {self.url}")
+            return True
+        except Exception as e:
+            metrics.incr('webhook.errors')
+            logger.error(f"Webhook 推送失败 [{self.url}]: {e}")
+            return False
+
+    def _post(self, payload: dict, headers: dict):
+        response = requests.post(self.url,
+                                 json=payload,
+                                 headers=headers,
+                                 timeout=Config.DELIVERY.webhook_timeout)
+        response.raise_for_status()